@@ -1,150 +1,354 @@
 import sqlite3
 import json
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from typing import Dict, Optional, List
+from utils.fork import register_after_fork
 from utils.logger import logger
 
+# Schema migrations applied in order on startup; PRAGMA user_version records
+# how many have run. Append new steps, never edit existing ones.
+MIGRATIONS = [
+    [
+        "CREATE INDEX IF NOT EXISTS idx_interactions_user_time ON interactions (user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_interactions_user_type_time ON interactions (user_id, interaction_type, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_interactions_user_course ON interactions (user_id, course_id)",
+    ],
+    [
+        # Bumped whenever a change could alter a user's recommendations
+        "ALTER TABLE users ADD COLUMN profile_version INTEGER DEFAULT 0",
+    ],
+    [
+        """CREATE TABLE IF NOT EXISTS onboarding_sessions (
+            user_id TEXT PRIMARY KEY,
+            step INTEGER,
+            data TEXT,
+            updated_at REAL
+        )""",
+    ],
+]
+
 class DatabaseManager:
-    """Handles SQLite database operations for user profiles and interactions"""
-    
-    def __init__(self, db_path: str = "course_recommender.db"):
+    """Handles SQLite database operations for user profiles and interactions.
+
+    Each thread keeps one long-lived connection (so sqlite3's per-connection
+    statement cache is reused across calls) opened in WAL mode with a busy
+    timeout. Writes go through ``transaction()``; nested use on the same
+    thread joins the outer transaction, so multi-step operations commit or
+    roll back together.
+    """
+
+    def __init__(self, db_path: str = "course_recommender.db", busy_timeout_ms: int = 5000,
+                 cache_size_kb: int = 8192):
         self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self._local = threading.local()
+        self._inherited = []
+        # A forked worker must not reuse the parent's SQLite handles
+        register_after_fork(self._drop_inherited_connections)
         self.init_database()
-    
+
+    def _drop_inherited_connections(self):
+        # Kept referenced rather than closed: closing a handle that the parent
+        # still uses can checkpoint or remove its WAL files
+        self._inherited.append(self._local)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening and tuning it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are opened explicitly in transaction()
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,
+                cached_statements=256
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements in one transaction on this thread's connection"""
+        conn = self._connection()
+        outermost = self._local.depth == 0
+        if outermost:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if outermost:
+                conn.execute("ROLLBACK")
+            raise
+        else:
+            self._local.depth -= 1
+            if outermost:
+                conn.execute("COMMIT")
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def init_database(self):
         """Initialize database tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY,
-                name TEXT,
-                preferences TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # User interactions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS interactions (
-                id TEXT PRIMARY KEY,
-                user_id TEXT,
-                course_id TEXT,
-                interaction_type TEXT,
-                rating INTEGER,
-                feedback TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        """)
-        
-        # Course completions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS completions (
-                id TEXT PRIMARY KEY,
-                user_id TEXT,
-                course_id TEXT,
-                completion_percentage REAL,
-                completion_date TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
-    
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+
+            # Users table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    preferences TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # User interactions table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS interactions (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    course_id TEXT,
+                    interaction_type TEXT,
+                    rating INTEGER,
+                    feedback TEXT,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            """)
+
+            # Course completions table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    course_id TEXT,
+                    completion_percentage REAL,
+                    completion_date TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            """)
+
+            self.migrate(conn)
+
+    def migrate(self, conn: sqlite3.Connection):
+        """Apply schema migrations that haven't run against this database yet"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+            logger.info(f"Applied database migration {number}")
+
     def create_user(self, user_id: str, name: str, preferences: Dict) -> bool:
         """Create a new user profile"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute("""
-                INSERT INTO users (user_id, name, preferences)
-                VALUES (?, ?, ?)
-            """, (user_id, name, json.dumps(preferences)))
-            conn.commit()
+            with self.transaction() as conn:
+                conn.execute("""
+                    INSERT INTO users (user_id, name, preferences)
+                    VALUES (?, ?, ?)
+                """, (user_id, name, json.dumps(preferences)))
             logger.info(f"Created user: {user_id}")
             return True
         except sqlite3.IntegrityError:
             logger.warning(f"User {user_id} already exists")
             return False
-        finally:
-            conn.close()
-    
+
     def get_user(self, user_id: str) -> Optional[Dict]:
         """Get user profile"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
+        cursor = self._connection().execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
         row = cursor.fetchone()
-        conn.close()
-        
+
         if row:
             return {
                 'user_id': row[0],
                 'name': row[1],
                 'preferences': json.loads(row[2]) if row[2] else {},
                 'created_at': row[3],
-                'updated_at': row[4]
+                'updated_at': row[4],
+                'profile_version': row[5] or 0
             }
         return None
-    
+
     def update_user_preferences(self, user_id: str, preferences: Dict):
         """Update user preferences"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE users 
-            SET preferences = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        """, (json.dumps(preferences), user_id))
-        
-        conn.commit()
-        conn.close()
-    
-    def add_interaction(self, user_id: str, course_id: str, interaction_type: str, 
+        with self.transaction() as conn:
+            conn.execute("""
+                UPDATE users
+                SET preferences = ?, updated_at = CURRENT_TIMESTAMP, profile_version = profile_version + 1
+                WHERE user_id = ?
+            """, (json.dumps(preferences), user_id))
+
+    def add_interaction(self, user_id: str, course_id: str, interaction_type: str,
                        rating: Optional[int] = None, feedback: Optional[str] = None):
         """Add user interaction"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         interaction_id = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO interactions (id, user_id, course_id, interaction_type, rating, feedback)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (interaction_id, user_id, course_id, interaction_type, rating, feedback))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            # Only a course the user hasn't touched before changes which courses
+            # are excluded from their recommendations
+            seen = conn.execute(
+                "SELECT 1 FROM interactions WHERE user_id = ? AND course_id = ? LIMIT 1", (user_id, course_id)
+            ).fetchone()
+            if not seen:
+                conn.execute(
+                    "UPDATE users SET profile_version = profile_version + 1 WHERE user_id = ?", (user_id,)
+                )
+            conn.execute("""
+                INSERT INTO interactions (id, user_id, course_id, interaction_type, rating, feedback)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (interaction_id, user_id, course_id, interaction_type, rating, feedback))
         logger.info(f"Added interaction: {interaction_type} for user {user_id}")
-    
+
     def get_user_interactions(self, user_id: str) -> List[Dict]:
         """Get all interactions for a user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+        cursor = self._connection().execute("""
             SELECT course_id, interaction_type, rating, feedback, timestamp
-            FROM interactions 
+            FROM interactions
             WHERE user_id = ?
             ORDER BY timestamp DESC
         """, (user_id,))
-        
-        interactions = []
-        for row in cursor.fetchall():
-            interactions.append({
-                'course_id': row[0],
-                'interaction_type': row[1],
-                'rating': row[2],
-                'feedback': row[3],
-                'timestamp': row[4]
-            })
-        
-        conn.close()
-        return interactions
\ No newline at end of file
+
+        return [self._interaction_from_row(row) for row in cursor.fetchall()]
+
+    def get_recently_active_user_ids(self, since_seconds: int = 24 * 3600, limit: int = 50) -> List[str]:
+        """Get users with an interaction in the last ``since_seconds``, most recent first"""
+        cursor = self._connection().execute("""
+            SELECT user_id, MAX(timestamp) AS last_seen
+            FROM interactions
+            WHERE timestamp >= datetime('now', ?)
+            GROUP BY user_id
+            ORDER BY last_seen DESC
+            LIMIT ?
+        """, (f"-{int(since_seconds)} seconds", limit))
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_onboarding_session(self, user_id: str, ttl_seconds: int = 3600) -> Optional[Dict]:
+        """Get a user's in-progress onboarding, or None if there is none or it has expired"""
+        row = self._connection().execute(
+            "SELECT step, data, updated_at FROM onboarding_sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if not row:
+            return None
+        if time.time() - row[2] > ttl_seconds:
+            self.delete_onboarding_session(user_id)
+            return None
+        return {'step': row[0], 'data': json.loads(row[1]) if row[1] else {}}
+
+    def save_onboarding_session(self, user_id: str, step: int, data: Dict):
+        """Create or replace a user's onboarding progress"""
+        with self.transaction() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO onboarding_sessions (user_id, step, data, updated_at)
+                VALUES (?, ?, ?, ?)
+            """, (user_id, step, json.dumps(data), time.time()))
+
+    def delete_onboarding_session(self, user_id: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM onboarding_sessions WHERE user_id = ?", (user_id,))
+
+    def purge_expired_onboarding_sessions(self, ttl_seconds: int = 3600) -> int:
+        """Delete abandoned onboarding sessions, returning how many were removed"""
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM onboarding_sessions WHERE updated_at < ?", (time.time() - ttl_seconds,)
+            )
+            return cursor.rowcount
+
+    def get_popular_course_ids(self, limit: int = 20) -> List[str]:
+        """Get the course IDs with the most interactions"""
+        cursor = self._connection().execute("""
+            SELECT course_id, COUNT(*) AS interaction_count
+            FROM interactions
+            GROUP BY course_id
+            ORDER BY interaction_count DESC
+            LIMIT ?
+        """, (limit,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_common_preferences(self, limit: int = 5) -> List[Dict]:
+        """Get the most frequently shared user preference profiles"""
+        cursor = self._connection().execute("""
+            SELECT preferences, COUNT(*) AS user_count
+            FROM users
+            WHERE preferences IS NOT NULL
+            GROUP BY preferences
+            ORDER BY user_count DESC
+            LIMIT ?
+        """, (limit,))
+        return [json.loads(row[0]) for row in cursor.fetchall() if row[0]]
+
+    @staticmethod
+    def _interaction_from_row(row) -> Dict:
+        return {
+            'course_id': row[0],
+            'interaction_type': row[1],
+            'rating': row[2],
+            'feedback': row[3],
+            'timestamp': row[4]
+        }
+
+    def latest_interaction(self, user_id: str, interaction_type: str) -> Optional[Dict]:
+        """Get a user's most recent interaction of one type"""
+        cursor = self._connection().execute("""
+            SELECT course_id, interaction_type, rating, feedback, timestamp
+            FROM interactions
+            WHERE user_id = ? AND interaction_type = ?
+            ORDER BY timestamp DESC, rowid DESC
+            LIMIT 1
+        """, (user_id, interaction_type))
+        row = cursor.fetchone()
+        return self._interaction_from_row(row) if row else None
+
+    def interacted_course_ids(self, user_id: str) -> set:
+        """Get the IDs of every course a user has interacted with"""
+        cursor = self._connection().execute(
+            "SELECT DISTINCT course_id FROM interactions WHERE user_id = ?", (user_id,)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def get_interaction_history(self, user_id: str, interaction_type: Optional[str] = None,
+                                limit: int = 20, before: Optional[tuple] = None) -> Dict:
+        """Get one page of a user's interactions, newest first.
+
+        Pass the returned ``next_cursor`` as ``before`` to fetch the next page;
+        it is None once the history is exhausted.
+        """
+        conditions = ["user_id = ?"]
+        params = [user_id]
+        if interaction_type is not None:
+            conditions.append("interaction_type = ?")
+            params.append(interaction_type)
+        if before is not None:
+            # rowid breaks ties between interactions logged in the same second
+            conditions.append("(timestamp < ? OR (timestamp = ? AND rowid < ?))")
+            params.extend([before[0], before[0], before[1]])
+        params.append(limit)
+
+        cursor = self._connection().execute(f"""
+            SELECT course_id, interaction_type, rating, feedback, timestamp, rowid
+            FROM interactions
+            WHERE {' AND '.join(conditions)}
+            ORDER BY timestamp DESC, rowid DESC
+            LIMIT ?
+        """, params)
+        rows = cursor.fetchall()
+
+        next_cursor = (rows[-1][4], rows[-1][5]) if len(rows) == limit else None
+        return {'interactions': [self._interaction_from_row(row) for row in rows], 'next_cursor': next_cursor}
@@ -0,0 +1,103 @@
+from typing import Iterator, TYPE_CHECKING
+import numpy as np
+from models.course import Course
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Raw Coursera CSV column -> Course field
+COLUMN_MAP = {
+    'course_title': 'title',
+    'course_organization': 'organization',
+    'course_Certificate_type': 'category',
+    'course_rating': 'rating',
+    'course_difficulty': 'difficulty',
+    'course_students_enrolled': 'students_enrolled'
+}
+
+DEFAULT_DURATION = 40  # default/fallback duration in hours
+DEFAULT_PRICE = 99.99
+DEFAULT_RATING = 4.0
+
+_SUFFIX_MULTIPLIERS = {'': 1, 'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}
+
+
+def parse_enrollment(values: "pd.Series") -> np.ndarray:
+    """Parse enrolment counts like "5.3k", "1.2m" or "3,400" into integers, 0 when unparseable"""
+    import pandas as pd
+    text = values.astype("string").str.strip().str.lower().str.replace(',', '', regex=False)
+    parts = text.str.extract(r'^(?P<number>\d+(?:\.\d+)?)\s*(?P<suffix>[kmb]?)$')
+    numbers = pd.to_numeric(parts['number'], errors='coerce')
+    multipliers = parts['suffix'].map(_SUFFIX_MULTIPLIERS)
+    counts = (numbers * multipliers).round()
+    return counts.fillna(0).astype(np.int64).to_numpy()
+
+
+def normalize_catalog_frame(df: "pd.DataFrame", start_index: int = 0) -> "pd.DataFrame":
+    """Turn a raw catalog frame into one column per Course field, in bulk.
+
+    Course IDs are row positions in the file, so ``start_index`` must be the
+    number of rows read before this chunk.
+    """
+    import pandas as pd
+    df = df.rename(columns=COLUMN_MAP)
+    n = len(df)
+
+    def column(name, default):
+        if name in df:
+            return df[name]
+        return pd.Series([default] * n, index=df.index)
+
+    category = column('category', 'General').fillna('General').astype(str)
+    difficulty = column('difficulty', 'mixed').fillna('mixed').astype(str).str.strip().str.lower()
+    rating = pd.to_numeric(column('rating', DEFAULT_RATING), errors='coerce').fillna(DEFAULT_RATING)
+
+    return pd.DataFrame({
+        'id': np.arange(start_index, start_index + n).astype(str),
+        'title': column('title', '').fillna('').astype(str).to_numpy(),
+        'description': column('organization', 'No description').fillna('No description').astype(str).to_numpy(),
+        'category': category.to_numpy(),
+        'difficulty': difficulty.to_numpy(),
+        'duration': np.full(n, DEFAULT_DURATION, dtype=np.int64),
+        # Comma-joined, like the vector store metadata
+        'tags': category.str.lower().to_numpy(),
+        'rating': rating.astype(float).to_numpy(),
+        'price': np.full(n, DEFAULT_PRICE),
+        'students_enrolled': parse_enrollment(column('students_enrolled', ''))
+    })
+
+
+def frame_to_courses(frame: "pd.DataFrame") -> list[Course]:
+    """Build Course objects from a normalized frame without DataFrame.iterrows"""
+    return [
+        Course(
+            id=course_id,
+            title=title,
+            description=description,
+            category=category,
+            difficulty=difficulty,
+            duration=int(duration),
+            tags=tags.split(',') if tags else [],
+            rating=float(rating),
+            price=float(price),
+            students_enrolled=int(students_enrolled)
+        )
+        for course_id, title, description, category, difficulty, duration, tags, rating, price, students_enrolled
+        in zip(frame['id'], frame['title'], frame['description'], frame['category'], frame['difficulty'],
+               frame['duration'], frame['tags'], frame['rating'], frame['price'], frame['students_enrolled'])
+    ]
+
+
+def iter_catalog_frames(csv_path: str, chunksize: int = 5000) -> Iterator["pd.DataFrame"]:
+    """Stream a catalog CSV as normalized frames of at most ``chunksize`` rows"""
+    # pandas is only imported once a catalog is actually read
+    import pandas as pd
+    start_index = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        yield normalize_catalog_frame(chunk, start_index)
+        start_index += len(chunk)
+
+
+def load_catalog_frame(csv_path: str) -> "pd.DataFrame":
+    import pandas as pd
+    return normalize_catalog_frame(pd.read_csv(csv_path))
@@ -0,0 +1,74 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class RecommendationCache:
+    """In-memory LRU cache of finished recommendation results.
+
+    Entries are keyed by user ID, normalized query, the user's profile version
+    and the request options. The profile version is bumped in the database
+    whenever preferences change or a new course interaction is logged, so a
+    stale result is simply never looked up again; ``invalidate`` drops a
+    user's entries early to free the space.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r"\s+", " ", query or "").strip().lower()
+
+    @classmethod
+    def make_key(cls, user_id: str, query: str, profile_version: int, *options) -> tuple:
+        return (user_id, cls.normalize_query(query), profile_version) + options
+
+    def get(self, key: tuple) -> Optional[dict]:
+        """Return a cached result, or None on a miss or an expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: tuple, result: dict):
+        with self._lock:
+            # Older profile versions of this user can never be hit again
+            for stale in [k for k in self._entries if k[0] == key[0] and k[2] != key[2]]:
+                del self._entries[stale]
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        """Drop every cached result for one user"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries)
+        }
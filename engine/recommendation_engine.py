@@ -1,47 +1,123 @@
-import pandas as pd
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import replace
 from db.database_manager import DatabaseManager
 from services.vector_store import VectorStore
-from services.ollama_client import OllamaClient
+from services.ollama_client import get_ollama_client
 from models.course import Course
+from models.course_catalog import CourseCatalog
+from models.search_constraints import SearchConstraints
+from engine.catalog_loader import iter_catalog_frames, frame_to_courses
+from engine.reranker import Reranker, weights_from_settings
+from engine.recommendation_cache import RecommendationCache
+from utils.config import get_setting
+from utils.fork import register_after_fork
 from utils.logger import logger
 
+FALLBACK_EXPLANATION = "Recommended based on your preferences."
+CATALOG_PATH = "data/coursea_data.csv"
+
+# Used when a user has no saved preferences
+DEFAULT_PREFERENCES = {
+    "preferred_categories": ["general"],
+    "preferred_difficulty": "intermediate",
+    "learning_style": "hands-on",
+    "preferred_duration": "medium",
+    "budget_preference": "medium",
+    "goals": ["skill development"]
+}
+
 class CourseRecommendationEngine:
     def __init__(self):
         self.db = DatabaseManager()
         self.vector_store = VectorStore()
-        self.llm = OllamaClient()
-        self.courses = []
-        self.load_courses_from_csv("data/coursea_data.csv")
-
-    def load_courses_from_csv(self, csv_path: str):
-        df = pd.read_csv(csv_path)
-        df = df.rename(columns={
-            'course_title': 'title',
-            'course_organization': 'organization',
-            'course_Certificate_type': 'category',
-            'course_rating': 'rating',
-            'course_difficulty': 'difficulty',
-            'course_students_enrolled': 'students_enrolled'
-        })
-
-        courses = []
-        for idx, row in df.iterrows():
-            course = Course(
-                id=str(idx),
-                title=row['title'],
-                description=row.get('organization', 'No description'),
-                category=row.get('category', 'General'),
-                difficulty=str(row.get('difficulty', 'mixed')).lower(),
-                duration=40,  # default/fallback duration in hours,
-                tags=[str(row.get('category', 'general')).lower()],
-                rating=float(row.get('rating', 4.0)),
-                price=99.99  
+        self._start_explanation_pool()
+        self.explanation_deadline = get_setting("EXPLANATION_DEADLINE_SECONDS", 20.0, cast=float)
+        # "per_course": one LLM call per course; "batch": one call explaining all selected courses
+        self.explanation_mode = get_setting("EXPLANATION_MODE", "per_course")
+        self.candidate_pool_factor = get_setting("CANDIDATE_POOL_FACTOR", 3, cast=int)
+        self.rerank_weights = weights_from_settings()
+        self.recommendation_cache = None
+        if get_setting("RECOMMENDATION_CACHE_ENABLED", True, cast=bool):
+            self.recommendation_cache = RecommendationCache(
+                max_entries=get_setting("RECOMMENDATION_CACHE_MAX_ENTRIES", 1000, cast=int),
+                ttl_seconds=get_setting("RECOMMENDATION_CACHE_TTL_SECONDS", 3600, cast=int)
             )
-            courses.append(course)
+        self._stop_precompute = threading.Event()
+        self._reload_lock = threading.Lock()
+        self.catalog = CourseCatalog.from_courses([])
+        self.catalog_path = get_setting("CATALOG_PATH", CATALOG_PATH)
+        self.load_courses_from_csv(self.catalog_path)
+
+        self.precompute_interval = get_setting("RECOMMENDATION_PRECOMPUTE_INTERVAL_SECONDS", 0, cast=int)
+        if self.precompute_interval > 0:
+            self.start_precompute_job(self.precompute_interval)
+        # Pre-forked workers share the loaded catalog and model copy-on-write
+        # but need their own threads
+        register_after_fork(self._after_fork)
+
+    @property
+    def llm(self):
+        # Resolved on first use so building the engine never waits on the LLM client
+        return get_ollama_client()
+
+    def _start_explanation_pool(self):
+        # Bounded pool shared by all requests so a burst can't open unlimited LLM calls
+        self.explanation_pool = ThreadPoolExecutor(
+            max_workers=get_setting("EXPLANATION_WORKERS", 4, cast=int),
+            thread_name_prefix="explanations"
+        )
+
+    def _after_fork(self):
+        self._start_explanation_pool()
+        self._stop_precompute = threading.Event()
+        if self.precompute_interval > 0:
+            self.start_precompute_job(self.precompute_interval)
+
+    def load_courses_from_csv(self, csv_path: str, chunksize: int = None) -> dict:
+        """Load the catalog in chunks, syncing each chunk into the vector store as it is parsed"""
+        chunksize = chunksize or get_setting("CATALOG_CHUNK_SIZE", 5000, cast=int)
+        frames = []
+
+        def course_batches():
+            for frame in iter_catalog_frames(csv_path, chunksize):
+                frames.append(frame)
+                yield frame_to_courses(frame)
 
-        self.courses = courses
-        self.vector_store.add_courses(courses)
-        logger.info(f"Loaded {len(courses)} courses from CSV and added to vector store.")
+        report = self.vector_store.sync_course_batches(course_batches())
+        if frames:
+            import pandas as pd
+            catalog = CourseCatalog.from_frame(pd.concat(frames, ignore_index=True))
+        else:
+            catalog = CourseCatalog.from_courses([])
+        # Requests in flight keep the catalog they started with
+        self.catalog = catalog
+        if self.recommendation_cache is not None:
+            self.recommendation_cache.clear()
+        logger.info(
+            f"Loaded {len(self.catalog)} courses from CSV: {report['added']} added, {report['updated']} updated, "
+            f"{report['skipped']} skipped, {report['removed']} removed."
+        )
+        return report
+
+    def reload_catalog(self) -> dict:
+        """Re-sync the catalog CSV into the vector store and swap in the new catalog"""
+        # One sync at a time: concurrent syncs would race on the same manifest
+        with self._reload_lock:
+            return self.load_courses_from_csv(self.catalog_path)
+
+    def warm_up(self) -> float:
+        """Run one search end to end so the first real request doesn't pay for
+        model and index initialisation; returns the seconds it took"""
+        started = time.perf_counter()
+        self.vector_store.search_similar_courses("warm up", DEFAULT_PREFERENCES, n_results=1)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Recommendation engine warmed up in {elapsed:.2f}s")
+        return elapsed
 
     def create_user_profile(self, user_id: str, name: str, initial_feedback: str) -> dict:
         preferences = self.llm.extract_preferences(initial_feedback)
@@ -56,57 +132,112 @@ class CourseRecommendationEngine:
         if user and 'preferences' in user:
             return user['preferences']
         # Return some default preferences if none saved
-        return {
-            "preferred_categories": ["general"],
-            "preferred_difficulty": "intermediate",
-            "learning_style": "hands-on",
-            "preferred_duration": "medium",
-            "budget_preference": "medium",
-            "goals": ["skill development"]
-        }
-    def get_personalized_recommendations(self, user_id: str, query: str = "", num_recommendations: int = 5) -> dict:
+        return dict(DEFAULT_PREFERENCES)
+    def get_personalized_recommendations(self, user_id: str, query: str = "", num_recommendations: int = 5,
+                                         include_explanations: bool = True,
+                                         constraints: SearchConstraints = None) -> dict:
         user = self.db.get_user(user_id)
         if not user:
             return {'error': 'User not found'}
 
-        interactions = self.db.get_user_interactions(user_id)
+        cache_key = None
+        if self.recommendation_cache is not None and constraints is None:
+            cache_key = RecommendationCache.make_key(
+                user_id, query, user['profile_version'], num_recommendations, include_explanations
+            )
+            cached = self.recommendation_cache.get(cache_key)
+            if cached is not None:
+                return self.copy_result(cached)
+
+        result = self.compute_recommendations(user, query, num_recommendations, include_explanations, constraints)
+        # Don't pin deadline fallbacks in the cache; the next request may get real explanations
+        if cache_key is not None and not any(
+                course.get('explanation') == FALLBACK_EXPLANATION for course in result['recommendations']):
+            self.recommendation_cache.set(cache_key, self.copy_result(result))
+        return result
+
+    @staticmethod
+    def copy_result(result: dict) -> dict:
+        """Copy a result deeply enough that callers can't mutate a cached one"""
+        return {**result, 'recommendations': [dict(course) for course in result['recommendations']]}
+
+    def compute_recommendations(self, user: dict, query: str, num_recommendations: int,
+                                include_explanations: bool, constraints: SearchConstraints = None) -> dict:
+        """Run the full search, re-rank and explanation pipeline for one user"""
+        user_id = user['user_id']
+        # Only the IDs are needed to exclude already-seen courses; explanation
+        # prompts don't use the interaction history itself
+        interacted_course_ids = self.db.interacted_course_ids(user_id)
 
         if not query:
             query = f"Recommend courses based on my interests: {', '.join(user['preferences'].get('preferred_categories', []))}"
 
-        similar_courses = self.vector_store.search_similar_courses(query, user['preferences'], n_results=num_recommendations*3)
-
-        filtered = self.filter_recommendations(similar_courses, user['preferences'], interactions)
-        recommendations = []
-        for course in filtered[:num_recommendations]:
-            explanation = self.generate_recommendation_explanation(course, user['preferences'], interactions)
-            recommendations.append({**course, 'explanation': explanation})
-
-        return {'user_id': user_id, 'recommendations': recommendations, 'total_found': len(filtered)}
-
-    def filter_recommendations(self, courses: list[dict], preferences: dict, interactions: list[dict]) -> list[dict]:
-        interacted_course_ids = {i['course_id'] for i in interactions}
-        filtered = [c for c in courses if c['course_id'] not in interacted_course_ids]
-
-        for course in filtered:
-            score = course['similarity_score']
-            if course['category'] in preferences.get('preferred_categories', []):
-                score += 0.2
-            if course['difficulty'] == preferences.get('preferred_difficulty'):
-                score += 0.1
-            duration_pref = preferences.get('preferred_duration', 'medium')
-            if duration_pref == 'short' and course['duration'] <= 30:
-                score += 0.1
-            elif duration_pref == 'medium' and 30 < course['duration'] <= 60:
-                score += 0.1
-            elif duration_pref == 'long' and course['duration'] > 60:
-                score += 0.1
-            course['final_score'] = score
-
-        return sorted(filtered, key=lambda x: x['final_score'], reverse=True)
-
-    def generate_recommendation_explanation(self, course: dict, preferences: dict, interactions: list[dict]) -> str:
-        prompt = f"""
+        # Already-seen courses are filtered inside the vector search, so the
+        # candidate pool only needs headroom for re-ranking
+        constraints = replace(constraints) if constraints is not None else SearchConstraints()
+        constraints.exclude_ids = set(constraints.exclude_ids) | interacted_course_ids
+        similar_courses = self.vector_store.search_similar_courses(
+            query, user['preferences'], n_results=num_recommendations * self.candidate_pool_factor,
+            constraints=constraints
+        )
+
+        selected, total_found = self.filter_recommendations(similar_courses, user['preferences'],
+                                                            interacted_course_ids, k=num_recommendations)
+        if not include_explanations:
+            # Callers that stream explanations themselves only need the ranking
+            return {'user_id': user_id, 'recommendations': [dict(course) for course in selected],
+                    'total_found': total_found, 'preferences': user['preferences']}
+        if self.explanation_mode == "batch":
+            explanations = self.generate_batch_explanations(selected, user['preferences'])
+        else:
+            explanations = self.generate_explanations(selected, user['preferences'])
+        recommendations = [{**course, 'explanation': explanation} for course, explanation in zip(selected, explanations)]
+
+        return {'user_id': user_id, 'recommendations': recommendations, 'total_found': total_found}
+
+    def filter_recommendations(self, courses: list[dict], preferences: dict, interacted_course_ids: set,
+                               k: int = None) -> tuple[list[dict], int]:
+        """Re-rank the courses that pass the filter; returns the top ``k`` and how many passed"""
+        # Vector hits for courses no longer in the catalog are stale and dropped
+        filtered = [c for c in courses if c['course_id'] not in interacted_course_ids and c['course_id'] in self.catalog]
+        return Reranker(self.catalog, self.rerank_weights).rerank(filtered, preferences, k), len(filtered)
+
+    def generate_explanations(self, courses: list[dict], preferences: dict, deadline: float = None) -> list[str]:
+        """Generate explanations for several courses concurrently, in the same order.
+
+        Explanations not finished within ``deadline`` seconds fall back to the
+        generic text; calls already running keep going in the background and
+        still populate the LLM cache for the next request.
+        """
+        if not courses:
+            return []
+        deadline = self.explanation_deadline if deadline is None else deadline
+        started = time.monotonic()
+        futures = [
+            self.explanation_pool.submit(self.generate_recommendation_explanation, course, preferences)
+            for course in courses
+        ]
+        wait(futures, timeout=deadline)
+
+        explanations = []
+        timed_out = 0
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                explanations.append(future.result())
+            else:
+                future.cancel()
+                timed_out += 1
+                explanations.append(FALLBACK_EXPLANATION)
+        if timed_out:
+            logger.warning(
+                f"{timed_out}/{len(courses)} explanations missed the {deadline:.1f}s deadline "
+                f"after {time.monotonic() - started:.1f}s"
+            )
+        return explanations
+
+    @staticmethod
+    def build_explanation_prompt(course: dict, preferences: dict) -> str:
+        return f"""
     You are an AI course advisor. A user is looking for personalized course recommendations based on their learning preferences.
 
     User preferences:
@@ -127,28 +258,252 @@ class CourseRecommendationEngine:
     Please generate a short two line only, friendly explanation for why this course is recommended to the user.
     """
 
+    def generate_recommendation_explanation(self, course: dict, preferences: dict) -> str:
+        prompt = self.build_explanation_prompt(course, preferences)
         try:
-            response = self.llm.generate_response(prompt)
+            # Raising keeps an outage's apology text from being cached as an explanation
+            response = self.llm.generate_response(prompt, raise_on_error=True)
             return response.strip()
         except Exception as e:
             logger.warning(f"LLM explanation generation failed: {e}")
-            return "Recommended based on your preferences."
+            return FALLBACK_EXPLANATION
+
+    def stream_recommendation_explanation(self, course: dict, preferences: dict):
+        """Yield the explanation for a course as the LLM produces it"""
+        prompt = self.build_explanation_prompt(course, preferences)
+        streamed = False
+        try:
+            for token in self.llm.stream_response(prompt, raise_on_error=True):
+                streamed = True
+                yield token
+        except Exception as e:
+            logger.warning(f"LLM explanation streaming failed: {e}")
+            if not streamed:
+                yield FALLBACK_EXPLANATION
+
+    def stream_explanations(self, courses: list[dict], preferences: dict, deadline: float = None):
+        """Stream explanations for several courses at once.
+
+        Every course's stream runs on the explanation pool and ``(index,
+        token)`` pairs are yielded as they arrive, interleaved across courses.
+        Streams still running after ``deadline`` seconds are abandoned; their
+        courses get whatever text arrived so far.
+        """
+        deadline = self.explanation_deadline if deadline is None else deadline
+        tokens = queue.Queue()
+        finished = object()
 
+        def produce(index, course):
+            try:
+                for token in self.stream_recommendation_explanation(course, preferences):
+                    tokens.put((index, token))
+            finally:
+                tokens.put((index, finished))
+
+        for index, course in enumerate(courses):
+            self.explanation_pool.submit(produce, index, course)
+        remaining = len(courses)
+        ends_at = time.monotonic() + deadline
+        while remaining:
+            try:
+                index, token = tokens.get(timeout=max(0.0, ends_at - time.monotonic()))
+            except queue.Empty:
+                logger.warning(f"{remaining}/{len(courses)} explanation streams missed the {deadline:.1f}s deadline")
+                return
+            if token is finished:
+                remaining -= 1
+            else:
+                yield index, token
+
+    def generate_batch_explanations(self, courses: list[dict], preferences: dict, deadline: float = None) -> list[str]:
+        """Explain all selected courses with a single LLM call.
+
+        The preference block is sent once instead of once per course, and the
+        model is asked for a JSON array of per-course explanations. Courses
+        missing from the reply get the fallback text.
+        """
+        if not courses:
+            return []
+        deadline = self.explanation_deadline if deadline is None else deadline
+        course_lines = "\n".join(
+            f"    {i}. [id: {course['course_id']}] {course['title']} | Category: {course['category']} | "
+            f"Difficulty: {course['difficulty']} | Rating: {course['rating']} | Duration: {course['duration']} hours"
+            for i, course in enumerate(courses, 1)
+        )
+        prompt = f"""
+    You are an AI course advisor. A user is looking for personalized course recommendations based on their learning preferences.
+
+    User preferences:
+    - Categories: {', '.join(preferences.get('preferred_categories', []))}
+    - Difficulty: {preferences.get('preferred_difficulty')}
+    - Duration preference: {preferences.get('preferred_duration')}
+    - Learning style: {preferences.get('learning_style')}
+    - Goals: {', '.join(preferences.get('goals', []))}
+
+    Recommended courses:
+{course_lines}
+
+    For each course, write a short two line only, friendly explanation for why it is recommended to the user.
+    Return ONLY a JSON array in this format:
+    [{{"id": "<course id>", "explanation": "<explanation>"}}]
+    """
+
+        # Only cache replies that explain every course, so a bad one is retried next time
+        cache = self.llm.cache
+        response = cache.get(self.llm.model, prompt) if cache else None
+        fresh = response is None
+        if fresh:
+            future = self.explanation_pool.submit(self.llm.generate_response, prompt, use_cache=False,
+                                                  raise_on_error=True)
+            try:
+                response = future.result(timeout=deadline)
+            except Exception as e:
+                logger.warning(f"Batch explanation generation failed: {e}")
+                return [FALLBACK_EXPLANATION] * len(courses)
+
+        by_id = self.parse_batch_explanations(response, [course['course_id'] for course in courses])
+        missing = sum(1 for course in courses if course['course_id'] not in by_id)
+        if missing:
+            logger.warning(f"Batch explanation reply was missing {missing}/{len(courses)} courses")
+        elif fresh and cache:
+            cache.set(self.llm.model, prompt, response)
+        return [by_id.get(course['course_id'], FALLBACK_EXPLANATION) for course in courses]
+
+    @staticmethod
+    def parse_batch_explanations(response: str, course_ids: list[str]) -> dict:
+        """Map course IDs to explanations from a (possibly malformed) JSON array reply.
+
+        Entries are matched by their ``id`` field, or by position when the
+        model drops or mangles the IDs.
+        """
+        entries = None
+        start = response.find('[')
+        end = response.rfind(']') + 1
+        if start != -1 and end > start:
+            try:
+                entries = json.loads(response[start:end])
+            except ValueError:
+                entries = None
+        if not isinstance(entries, list):
+            # Salvage individual objects from truncated or otherwise broken arrays
+            entries = []
+            for match in re.finditer(r'\{[^{}]*\}', response):
+                try:
+                    entries.append(json.loads(match.group(0)))
+                except ValueError:
+                    continue
+
+        explanations = {}
+        for position, entry in enumerate(entries):
+            if isinstance(entry, str):
+                entry = {'explanation': entry}
+            if not isinstance(entry, dict):
+                continue
+            text = str(entry.get('explanation') or '').strip()
+            if not text:
+                continue
+            course_id = str(entry.get('id', entry.get('course_id', '')))
+            if course_id not in course_ids and position < len(course_ids):
+                course_id = course_ids[position]
+            if course_id in course_ids and course_id not in explanations:
+                explanations[course_id] = text
+        return explanations
+
+    @staticmethod
+    def course_summary(course: Course) -> dict:
+        """Course fields in the same shape vector search returns them"""
+        return {
+            'course_id': course.id,
+            'title': course.title,
+            'category': course.category,
+            'difficulty': course.difficulty,
+            'duration': course.duration,
+            'rating': course.rating,
+            'price': course.price,
+            'tags': course.tags,
+            'students_enrolled': course.students_enrolled
+        }
+
+    def prewarm_explanation_cache(self, num_courses: int = 20, num_profiles: int = 5) -> int:
+        """Generate explanations for the most popular courses (by interactions, then
+        enrolment) under the most common preference profiles so later requests
+        are served from the LLM cache"""
+        popular = [self.catalog.get(cid) for cid in self.db.get_popular_course_ids(num_courses) if cid in self.catalog]
+        if len(popular) < num_courses:
+            popular += self.catalog.most_enrolled(num_courses - len(popular), exclude=[c.id for c in popular])
+
+        profiles = self.db.get_common_preferences(num_profiles) or [DEFAULT_PREFERENCES]
+
+        warmed = 0
+        for preferences in profiles:
+            for course in popular:
+                self.generate_recommendation_explanation(self.course_summary(course), preferences)
+                warmed += 1
+        if self.llm.cache:
+            logger.info(f"Pre-warmed {warmed} explanations, LLM cache stats: {self.llm.cache.stats()}")
+        return warmed
+
+    def precompute_recommendations(self, since_seconds: int = 24 * 3600, limit: int = 50,
+                                   num_recommendations: int = 3, include_explanations: bool = True) -> int:
+        """Fill the recommendation cache for recently active users, for both their
+        history-based recommendations and their last query"""
+        if self.recommendation_cache is None:
+            return 0
+        computed = 0
+        for user_id in self.db.get_recently_active_user_ids(since_seconds, limit):
+            latest = self.db.latest_interaction(user_id, "query")
+            queries = [""] + ([latest['feedback']] if latest and latest['feedback'] else [])
+            for query in queries:
+                try:
+                    self.get_personalized_recommendations(user_id, query, num_recommendations, include_explanations)
+                    computed += 1
+                except Exception as e:
+                    logger.warning(f"Precomputing recommendations for {user_id} failed: {e}")
+        logger.info(f"Precomputed {computed} recommendation sets, cache stats: {self.recommendation_cache.stats()}")
+        return computed
+
+    def start_precompute_job(self, interval_seconds: int) -> threading.Thread:
+        """Run ``precompute_recommendations`` every ``interval_seconds`` on a daemon thread"""
+        def run():
+            while not self._stop_precompute.wait(interval_seconds):
+                try:
+                    self.precompute_recommendations(
+                        num_recommendations=get_setting("RECOMMENDATION_PRECOMPUTE_COUNT", 3, cast=int)
+                    )
+                except Exception as e:
+                    logger.warning(f"Recommendation precompute job failed: {e}")
+
+        thread = threading.Thread(target=run, name="recommendation-precompute", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_precompute_job(self):
+        self._stop_precompute.set()
+
+    def close(self):
+        """Stop background work and release this thread's database connection"""
+        self.stop_precompute_job()
+        self.explanation_pool.shutdown(wait=False, cancel_futures=True)
+        self.db.close()
 
     def process_user_feedback(self, user_id: str, course_id: str, rating: int, feedback: str) -> dict:
-        self.db.add_interaction(user_id, course_id, "feedback", rating, feedback)
-
-        if rating >= 4:
-            user = self.db.get_user(user_id)
-            if user:
-                course = next((c for c in self.courses if c.id == course_id), None)
-                if course:
-                    preferences = user['preferences']
-                    if 'preferred_categories' not in preferences:
-                        preferences['preferred_categories'] = []
-                    if course.category not in preferences['preferred_categories']:
-                        preferences['preferred_categories'].append(course.category)
-                    if rating == 5 and course.difficulty != preferences.get('preferred_difficulty'):
-                        preferences['preferred_difficulty'] = course.difficulty
-                    self.db.update_user_preferences(user_id, preferences)
-        return {'message': 'Feedback processed successfully', 'updated_preferences': rating >= 4}
+        # Record the feedback and any preference change atomically
+        with self.db.transaction():
+            self.db.add_interaction(user_id, course_id, "feedback", rating, feedback)
+
+            if rating >= 4:
+                user = self.db.get_user(user_id)
+                if user:
+                    course = self.catalog.get(course_id)
+                    if course:
+                        preferences = user['preferences']
+                        if 'preferred_categories' not in preferences:
+                            preferences['preferred_categories'] = []
+                        if course.category not in preferences['preferred_categories']:
+                            preferences['preferred_categories'].append(course.category)
+                        if rating == 5 and course.difficulty != preferences.get('preferred_difficulty'):
+                            preferences['preferred_difficulty'] = course.difficulty
+                        self.db.update_user_preferences(user_id, preferences)
+        if self.recommendation_cache is not None:
+            self.recommendation_cache.invalidate(user_id)
+        return {'message': 'Feedback processed successfully', 'updated_preferences': rating >= 4}
\ No newline at end of file
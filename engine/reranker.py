@@ -0,0 +1,102 @@
+import json
+from typing import Dict, Optional
+import numpy as np
+from models.course_catalog import CourseCatalog
+from utils.config import get_setting
+from utils.logger import logger
+
+FEATURES = ("similarity", "category", "difficulty", "duration", "rating", "budget")
+
+# Defaults reproduce the original hand-tuned bonuses; rating and budget are opt-in
+DEFAULT_WEIGHTS = {
+    "similarity": 1.0,
+    "category": 0.2,
+    "difficulty": 0.1,
+    "duration": 0.1,
+    "rating": 0.0,
+    "budget": 0.0,
+}
+
+# Highest price that still fits each budget preference
+BUDGET_LIMITS = {"free": 0.0, "low": 50.0, "medium": 150.0, "high": float("inf")}
+
+# (min exclusive, max inclusive) hours for each duration preference
+DURATION_BUCKETS = {"short": (-np.inf, 30), "medium": (30, 60), "long": (60, np.inf)}
+
+
+def weights_from_settings() -> Dict[str, float]:
+    """Default weights, overridden by a RERANK_WEIGHTS JSON object if set"""
+    weights = dict(DEFAULT_WEIGHTS)
+    raw = get_setting("RERANK_WEIGHTS")
+    if raw:
+        try:
+            weights.update({k: float(v) for k, v in json.loads(raw).items() if k in FEATURES})
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring invalid RERANK_WEIGHTS: {e}")
+    return weights
+
+
+class Reranker:
+    """Scores candidate courses with a linear model over per-course feature columns.
+
+    Features are computed for every candidate at once as NumPy arrays (course
+    fields come straight from the catalog columns) and combined with the
+    weight vector in a single matrix-vector product.
+    """
+
+    def __init__(self, catalog: CourseCatalog, weights: Optional[Dict[str, float]] = None):
+        self.catalog = catalog
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.weights.update(weights if weights is not None else weights_from_settings())
+
+    @property
+    def weight_vector(self) -> np.ndarray:
+        return np.array([self.weights.get(name, 0.0) for name in FEATURES], dtype=np.float64)
+
+    def features(self, courses: list[dict], preferences: dict) -> np.ndarray:
+        """An (n_candidates, n_features) matrix in FEATURES order.
+
+        Candidates must be in the catalog.
+        """
+        catalog = self.catalog
+        positions = np.fromiter((catalog.position(c['course_id']) for c in courses), dtype=np.int64,
+                                count=len(courses))
+        similarity = np.fromiter((c['similarity_score'] for c in courses), dtype=np.float64, count=len(courses))
+
+        preferred_categories = set(preferences.get('preferred_categories', []))
+        category_codes = [i for i, name in enumerate(catalog.category_names) if name in preferred_categories]
+        category = np.isin(catalog.category_codes[positions], category_codes)
+
+        difficulty_codes = [i for i, name in enumerate(catalog.difficulty_names)
+                            if name == preferences.get('preferred_difficulty')]
+        difficulty = np.isin(catalog.difficulty_codes[positions], difficulty_codes)
+
+        durations = catalog.durations[positions]
+        low, high = DURATION_BUCKETS.get(preferences.get('preferred_duration', 'medium'), (np.inf, np.inf))
+        duration = (durations > low) & (durations <= high)
+
+        rating = catalog.ratings[positions] / 5.0
+
+        limit = BUDGET_LIMITS.get(preferences.get('budget_preference'))
+        if limit is None:
+            budget = np.zeros(len(courses))
+        else:
+            budget = catalog.prices[positions] <= limit
+
+        return np.column_stack([similarity, category, difficulty, duration, rating, budget]).astype(np.float64)
+
+    def rerank(self, courses: list[dict], preferences: dict, k: int = None) -> list[dict]:
+        """Return the top-k candidates by weighted score, best first, with ``final_score`` set"""
+        if not courses:
+            return []
+        scores = self.features(courses, preferences) @ self.weight_vector
+        k = len(courses) if k is None else min(k, len(courses))
+        if k <= 0:
+            return []
+        if k < len(courses):
+            # Sorted back into input order so ties keep their search ranking
+            top = np.sort(np.argpartition(-scores, k - 1)[:k])
+        else:
+            top = np.arange(len(courses))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [{**courses[i], 'final_score': float(scores[i])} for i in top]
@@ -0,0 +1,30 @@
+# Pre-fork deployment of the WhatsApp webhook:
+#   gunicorn -c gunicorn.conf.py interfaces.whatsapp_interface:app
+import gc
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Build the recommendation engine (encoder, catalog, vector index) once in the
+# master; workers then share those pages copy-on-write instead of each
+# loading their own copy.
+preload_app = True
+# Build it synchronously at import; a warm-up thread wouldn't survive the fork
+os.environ.setdefault("WARMUP_MODE", "eager")
+
+# Each worker paces its own WhatsApp sends, so split the account-wide
+# WHATSAPP_SEND_RATE between them. Add one if the Streamlit app sends through
+# the same account, and give it the same value.
+os.environ.setdefault("WHATSAPP_SENDING_PROCESSES", str(workers))
+
+# The numpy backend memory-maps its vectors so every worker maps the same
+# file; Chroma's client holds handles and threads that don't survive a fork.
+os.environ.setdefault("VECTOR_BACKEND", "numpy")
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so its
+    # bookkeeping doesn't write to (and un-share) the inherited pages
+    gc.freeze()
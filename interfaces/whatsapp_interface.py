@@ -1,49 +1,187 @@
-from flask import Flask, request
+from flask import Flask, request, jsonify
 import sys, os
-import threading
 import random
+import re
+import threading
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from services.ollama_client import OllamaClient
-from engine.recommendation_engine import CourseRecommendationEngine
-from utils.twilio_client import send_whatsapp_message
+from services.ollama_client import get_ollama_client
+from services.job_queue import JobQueue, DUPLICATE, FULL
+from utils.twilio_client import send_whatsapp_message, dispatcher
 from db.database_manager import DatabaseManager
-from utils.youtube_search import YouTubeSearch
+from utils.config import get_setting
+from utils.logger import logger
 from dotenv import load_dotenv
 
 app = Flask(__name__)
-engine = CourseRecommendationEngine()
 db = DatabaseManager()
 load_dotenv()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-youtube_client = YouTubeSearch(YOUTUBE_API_KEY)
-pending_onboarding = {}
+# "background": build the engine on a thread after start-up, "eager": build it
+# before serving (pre-fork masters), "off": build it on the first request that needs it
+WARMUP_MODE = get_setting("WARMUP_MODE", "background")
+_engine = None
+_youtube_client = None
+_engine_lock = threading.Lock()
+_youtube_lock = threading.Lock()
+HISTORY_PAGE_SIZE = 10
+# Onboarding lives in the shared database so any worker process can continue it
+ONBOARDING_TTL_SECONDS = get_setting("ONBOARDING_TTL_SECONDS", 3600, cast=int)
+_last_onboarding_purge = 0.0
+
+# Recommendation and LLM work runs here so webhook requests return immediately
+jobs = JobQueue(
+    num_workers=get_setting("WHATSAPP_WORKERS", 4, cast=int),
+    max_depth=get_setting("WHATSAPP_QUEUE_DEPTH", 100, cast=int),
+    max_retries=get_setting("WHATSAPP_JOB_RETRIES", 1, cast=int),
+    name="whatsapp"
+)
+
+def get_engine():
+    """The recommendation engine, built (and warmed up) on first use.
+
+    The ML stack is only imported here, so commands that just read the
+    database don't wait for it.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from engine.recommendation_engine import CourseRecommendationEngine
+                started = time.perf_counter()
+                engine = CourseRecommendationEngine()
+                engine.warm_up()
+                logger.info(f"Recommendation engine ready in {time.perf_counter() - started:.2f}s")
+                _engine = engine
+    return _engine
+
+def get_youtube_client():
+    global _youtube_client
+    if _youtube_client is None:
+        with _youtube_lock:
+            if _youtube_client is None:
+                from utils.youtube_search import YouTubeSearch
+                _youtube_client = YouTubeSearch(YOUTUBE_API_KEY)
+    return _youtube_client
+
+def split_first_sentence(text):
+    """Split off the first complete sentence, returning ("", text) if there isn't one yet"""
+    # Punctuation only ends a sentence once whitespace follows it ("3." may still become "3.5")
+    match = re.search(r'[.!?]\s', text)
+    if not match:
+        return "", text
+    return text[:match.end()].strip(), text[match.end():]
+
+def enqueue_job(user_id, fn, *args):
+    """Queue work for a user, telling them if it was refused; returns True if queued"""
+    status = jobs.submit(user_id, fn, user_id, *args)
+    if status == DUPLICATE:
+        send_whatsapp_message(user_id, "⏳ I'm still working on your previous request, please wait a moment.")
+    elif status == FULL:
+        send_whatsapp_message(user_id, "🚦 We're handling a lot of requests right now. Please try again in a minute.")
+    return status not in (DUPLICATE, FULL)
+
+def purge_onboarding_sessions():
+    """Delete onboarding sessions abandoned for longer than the TTL"""
+    removed = db.purge_expired_onboarding_sessions(ONBOARDING_TTL_SECONDS)
+    if removed:
+        logger.info(f"Purged {removed} abandoned onboarding sessions")
+
+def schedule_onboarding_purge():
+    """Queue a purge at most once per TTL in this worker; new onboardings trigger it"""
+    global _last_onboarding_purge
+    now = time.monotonic()
+    if now - _last_onboarding_purge >= ONBOARDING_TTL_SECONDS:
+        _last_onboarding_purge = now
+        jobs.submit("onboarding-purge", purge_onboarding_sessions)
+
+def reply(user_id, text):
+    """Send from a job; once a job has replied it is no longer retried, so nothing is sent twice"""
+    jobs.mark_output()
+    send_whatsapp_message(user_id, text)
 
 def process_recommendation(user_id, query):
     user = db.get_user(user_id)
     if not user:
-        send_whatsapp_message(user_id, "❌ Error: User not found. Please type 'start' to begin.")
+        reply(user_id, "❌ Error: User not found. Please type 'start' to begin.")
         return
 
-    engine.create_user_profile(user_id, user['name'], user['preferences'])
-    recs = engine.get_personalized_recommendations(user_id, query, 3)
+    get_engine().create_user_profile(user_id, user['name'], user['preferences'])
+    recs = get_engine().get_personalized_recommendations(user_id, query, 3)
 
     if "error" in recs:
-        send_whatsapp_message(user_id, "❌ Error: " + recs["error"])
+        reply(user_id, "❌ Error: " + recs["error"])
     else:
+        video_ids = get_youtube_client().videos_for_courses(recs["recommendations"])
         text = "📚 Top Course Recommendations:\n\n"
         for i, course in enumerate(recs["recommendations"], 1):
             text += f"{i}. *{course['title']}* ({course['difficulty'].capitalize()})\n"
             text += f"{course['explanation']}\n"         
  
-            # Add YouTube search and link
-            search_query = f"{course['title']} introduction"
-            yt_link = youtube_client.search_video(search_query)
+            # Add YouTube link
+            yt_link = video_ids.get(course['course_id'])
             if yt_link:
                 text += f"🎥 Watch: https://www.youtube.com/watch?v={yt_link}\n"
 
             text += "---\n"
-        send_whatsapp_message(user_id, text)
+        reply(user_id, text)
+
+def process_preference_recommendation(user_id, prefs):
+    """Recommend courses for newly saved preferences"""
+    user = db.get_user(user_id)
+    if not user:
+        reply(user_id, "❌ Error: User not found. Please type 'start' to begin.")
+        return
+
+    get_engine().create_user_profile(user_id, user["name"], user["preferences"])
+    recs = get_engine().get_personalized_recommendations(user_id, prefs, 3)
+
+    if "error" in recs:
+        reply(user_id, "❌ Error: " + recs["error"])
+    else:
+        text = "📚 Top Course Recommendations:\n\n"
+        for i, course in enumerate(recs["recommendations"], 1):
+            text += f"{i}. {course['title']} ({course['difficulty']})\n{course['explanation']}\n---\n"
+        reply(user_id, text)
+
+def process_feedback(user_id, course_id, fb_text):
+    """Record feedback and fold it into the user's preferences (needs the engine's catalog)"""
+    get_engine().process_user_feedback(user_id, course_id, 5, fb_text)
+    reply(user_id, "✅ Thank you! Feedback submitted.")
+
+def process_fallback_reply(user_id, msg):
+    """Answer a free-form message with the LLM, sending the first sentence as soon as it is generated"""
+    wp_engine = get_ollama_client()
+
+    fallback_prompt = (
+        f"The user asked: \"{msg}\"\n\n"
+        "Please provide a helpful and informative reply. Then, try to gently guide the user back to learning, "
+        "courses, or skill development. If possible, suggest a topic to explore.\n"
+    )
+
+    buffer = ""
+    sent_first = False
+    for token in wp_engine.stream_wp_response(fallback_prompt):
+        buffer += token
+        if not sent_first:
+            first, rest = split_first_sentence(buffer)
+            if first:
+                reply(user_id, first)
+                sent_first = True
+                buffer = rest
+    if buffer.strip():
+        reply(user_id, buffer.strip())
+
+@app.route("/jobs", methods=['GET'])
+def job_stats():
+    """Queue depth, in-flight jobs and outcome counters for this worker"""
+    return jsonify(jobs.stats())
+
+@app.route("/messages", methods=['GET'])
+def message_stats():
+    """Outbound message queue depth and delivery counters for this worker"""
+    return jsonify(dispatcher.stats())
 
 @app.route("/whatsapp", methods=['POST'])
 def whatsapp_reply():
@@ -52,37 +190,39 @@ def whatsapp_reply():
     msg_lower = msg.lower()
 
     user = db.get_user(user_id)
+    onboarding = None if msg_lower == "start" else db.get_onboarding_session(user_id, ONBOARDING_TTL_SECONDS)
 
     if msg_lower == "start":
-        pending_onboarding[user_id] = {"step": 1, "data": {}}
+        schedule_onboarding_purge()
+        db.save_onboarding_session(user_id, 1, {})
         send_whatsapp_message(user_id, "👋 Welcome! What's your name?")
         return "OK"
 
-    elif user_id in pending_onboarding:
-        step = pending_onboarding[user_id]["step"]
-        data = pending_onboarding[user_id]["data"]
+    elif onboarding:
+        step = onboarding["step"]
+        data = onboarding["data"]
 
         if step == 1:
             data["name"] = msg
-            pending_onboarding[user_id]["step"] += 1
+            db.save_onboarding_session(user_id, step + 1, data)
             send_whatsapp_message(user_id, "🎯 What's your learning goal? (e.g., get a job, explore AI)")
             return "OK"
 
         elif step == 2:
             data["goal"] = msg
-            pending_onboarding[user_id]["step"] += 1
+            db.save_onboarding_session(user_id, step + 1, data)
             send_whatsapp_message(user_id, "📚 What topics are you interested in?")
             return "OK"
 
         elif step == 3:
             data["interests"] = msg
-            pending_onboarding[user_id]["step"] += 1
+            db.save_onboarding_session(user_id, step + 1, data)
             send_whatsapp_message(user_id, "📈 Your skill level? (beginner/intermediate/advanced)")
             return "OK"
 
         elif step == 4:
             data["level"] = msg
-            pending_onboarding[user_id]["step"] += 1
+            db.save_onboarding_session(user_id, step + 1, data)
             send_whatsapp_message(user_id, "⏱️ Weekly time commitment? (e.g., 5 hours)")
             return "OK"
 
@@ -114,10 +254,11 @@ def whatsapp_reply():
             )
 
             onboarding_query = f"{preferences['goal']} with focus on {preferences['interest']}"
-            db.add_interaction(user_id, "onboarding_query", "query", feedback=onboarding_query)
-            threading.Thread(target=process_recommendation, args=(user_id, onboarding_query)).start()
+            # Only an accepted query becomes the one "recommend again" reuses
+            if enqueue_job(user_id, process_recommendation, onboarding_query):
+                db.add_interaction(user_id, "onboarding_query", "query", feedback=onboarding_query)
 
-            del pending_onboarding[user_id]
+            db.delete_onboarding_session(user_id)
             return "OK"
 
 
@@ -131,24 +272,24 @@ def whatsapp_reply():
         if not query:
             send_whatsapp_message(user_id, "⚠️ Please specify what you want to learn. Example: learn python for beginners")
         else:
-            send_whatsapp_message(user_id, "⏳ Generating your personalized recommendations, please wait...")
-            db.add_interaction(user_id, "manual_query", "query", feedback=query)
-            threading.Thread(target=process_recommendation, args=(user_id, query)).start()
+            if enqueue_job(user_id, process_recommendation, query):
+                db.add_interaction(user_id, "manual_query", "query", feedback=query)
+                send_whatsapp_message(user_id, "⏳ Generating your personalized recommendations, please wait...")
         return "OK"
 
     elif msg_lower == "recommend again":
-        interactions = db.get_user_interactions(user_id)
-        last_query = next((i["feedback"] for i in interactions if i["interaction_type"] == "query"), None)
+        latest = db.latest_interaction(user_id, "query")
+        last_query = latest["feedback"] if latest else None
         if last_query:
-            send_whatsapp_message(user_id, f"🔁 Recommending courses for your last goal: *{last_query}*")
-            send_whatsapp_message(user_id, "⏳ Please wait while we generate recommendations...")
-            threading.Thread(target=process_recommendation, args=(user_id, last_query)).start()
+            if enqueue_job(user_id, process_recommendation, last_query):
+                send_whatsapp_message(user_id, f"🔁 Recommending courses for your last goal: *{last_query}*")
+                send_whatsapp_message(user_id, "⏳ Please wait while we generate recommendations...")
         else:
             send_whatsapp_message(user_id, "❗ You haven't asked for any course recommendations yet. Try: learn <topic>")
 
     elif msg_lower == "history":
-        interactions = db.get_user_interactions(user_id)
-        goals = [i["feedback"] for i in interactions if i["interaction_type"] == "query"]
+        page = db.get_interaction_history(user_id, interaction_type="query", limit=HISTORY_PAGE_SIZE)
+        goals = [i["feedback"] for i in page["interactions"]]
         if goals:
             history = "🕘 Your Previous Learning Goals:\n" + "\n".join(f"{i+1}. {goal}" for i, goal in enumerate(goals))
             send_whatsapp_message(user_id, history)
@@ -160,9 +301,7 @@ def whatsapp_reply():
         if len(parts) >= 3:
             course_id = parts[1]
             fb_text = parts[2]
-            db.add_interaction(user_id, course_id, "feedback", feedback=fb_text)
-            engine.process_user_feedback(user_id, course_id, 5, fb_text)
-            send_whatsapp_message(user_id, "✅ Thank you! Feedback submitted.")
+            enqueue_job(user_id, process_feedback, course_id, fb_text)
         else:
             send_whatsapp_message(user_id, "⚠️ Format: feedback <course_id> <your feedback>")
 
@@ -184,19 +323,8 @@ def whatsapp_reply():
         if prefs:
             user["preferences"]["custom"] = prefs
             db.update_user_preferences(user_id, user["preferences"])
-            send_whatsapp_message(user_id, f"✅ Preferences saved: {prefs}\nFetching top course recommendations...")
-
-            # Auto-generate recommendations based on new preferences
-            engine.create_user_profile(user_id, user["name"], user["preferences"])
-            recs = engine.get_personalized_recommendations(user_id, prefs, 3)
-
-            if "error" in recs:
-                send_whatsapp_message(user_id, "❌ Error: " + recs["error"])
-            else:
-                text = "📚 Top Course Recommendations:\n\n"
-                for i, course in enumerate(recs["recommendations"], 1):
-                    text += f"{i}. {course['title']} ({course['difficulty']})\n{course['explanation']}\n---\n"
-                send_whatsapp_message(user_id, text)
+            if enqueue_job(user_id, process_preference_recommendation, prefs):
+                send_whatsapp_message(user_id, f"✅ Preferences saved: {prefs}\nFetching top course recommendations...")
 
         else:
             send_whatsapp_message(user_id, "⚠️ Please include your preferences. Example: `preference web dev, intermediate`")
@@ -222,18 +350,14 @@ def whatsapp_reply():
 
     else:
         # Call fallback generative response
-        wp_engine = OllamaClient()
-
-        fallback_prompt = (
-            f"The user asked: \"{msg}\"\n\n"
-            "Please provide a helpful and informative reply. Then, try to gently guide the user back to learning, "
-            "courses, or skill development. If possible, suggest a topic to explore.\n"
-        )
-
-        ai_reply = wp_engine.generate_wp_response(fallback_prompt)
-        send_whatsapp_message(user_id, ai_reply)
+        enqueue_job(user_id, process_fallback_reply, msg)
 
     return "OK"
 
+if WARMUP_MODE == "eager":
+    get_engine()
+elif WARMUP_MODE == "background":
+    threading.Thread(target=get_engine, name="engine-warmup", daemon=True).start()
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
@@ -1,17 +1,35 @@
 import streamlit as st
-from engine.recommendation_engine import CourseRecommendationEngine
+from engine.recommendation_engine import CourseRecommendationEngine, FALLBACK_EXPLANATION
 import uuid
+from concurrent.futures import TimeoutError as DeliveryTimeout
 from utils.twilio_client import send_whatsapp_message
+from utils.config import get_setting
 from utils.youtube_search import YouTubeSearch
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-youtube_client = YouTubeSearch(YOUTUBE_API_KEY)
+# Catalog reload and engine restart affect every session, so they are for operators only
+MAINTENANCE_PANEL = get_setting("MAINTENANCE_PANEL_ENABLED", False, cast=bool)
+WHATSAPP_SEND_TIMEOUT = get_setting("WHATSAPP_SEND_TIMEOUT_SECONDS", 15.0, cast=float)
 st.set_page_config(page_title="🎓 AI Course Recommender", layout="wide", initial_sidebar_state="expanded")
 
-engine = CourseRecommendationEngine()
+# Streamlit re-runs this script on every interaction; resources are built once
+# per server process and shared by all sessions, while per-user state lives
+# in st.session_state.
+@st.cache_resource(show_spinner="Loading recommendation engine...")
+def get_engine():
+    engine = CourseRecommendationEngine()
+    engine.warm_up()
+    return engine
+
+@st.cache_resource
+def get_youtube_client():
+    return YouTubeSearch(YOUTUBE_API_KEY)
+
+engine = get_engine()
+youtube_client = get_youtube_client()
 
 # --- Sidebar: User Profile Management ---
 st.sidebar.title("👤 User Profile")
@@ -56,6 +74,19 @@ if st.session_state.user_id:
     if st.sidebar.button("Logout"):
         st.session_state.user_id = None
         st.session_state.user_name = None
+
+if MAINTENANCE_PANEL:
+    with st.sidebar.expander("⚙️ Maintenance"):
+        if st.button("Reload course catalog"):
+            with st.spinner("Syncing course catalog..."):
+                report = engine.reload_catalog()
+            st.success(f"Catalog synced: {report['added']} added, {report['updated']} updated, {report['removed']} removed.")
+        if st.button("Restart engine"):
+            # Drops the shared engine; the next run builds and warms up a new one. The old
+            # one isn't closed because other sessions may still be using its explanation pool.
+            engine.stop_precompute_job()
+            get_engine.clear()
+            st.rerun()
        
 
 # --- Main content ---
@@ -81,17 +112,22 @@ else:
                 engine.db.update_user_preferences(st.session_state.user_id, new_prefs)
                 st.success("Preferences updated successfully!")
                 
-                recs = engine.get_personalized_recommendations(st.session_state.user_id, learning_prefs, num_recommendations=5)
+                # Explanations are streamed into the results below
+                recs = engine.get_personalized_recommendations(st.session_state.user_id, learning_prefs,
+                                                               num_recommendations=5, include_explanations=False)
                 st.session_state.recommendations = recs.get("recommendations", [])
+                st.session_state.recommendation_preferences = recs.get("preferences", {})
 
     # Button to load recommendations based on previous interactions (no query input)
     if st.button("Load Recommendations Based on Previous Interactions"):
         with st.spinner("Loading recommendations from your history..."):
-            recs = engine.get_personalized_recommendations(st.session_state.user_id, query="", num_recommendations=5)
+            recs = engine.get_personalized_recommendations(st.session_state.user_id, query="", num_recommendations=5,
+                                                           include_explanations=False)
             if "error" in recs:
                 st.error(recs["error"])
             else:
                 st.session_state.recommendations = recs.get("recommendations", [])
+                st.session_state.recommendation_preferences = recs.get("preferences", {})
                 st.success("Loaded recommendations based on your past interactions!")
 
     # Show recommendations if available
@@ -99,24 +135,51 @@ else:
 
     if recommendations:
         st.header("Recommended Courses For You")
+        # One concurrent, cached lookup for the whole list, reused by the WhatsApp message below
+        video_ids = youtube_client.videos_for_courses(recommendations)
+        preferences = st.session_state.get("recommendation_preferences", {})
+        pending = [course for course in recommendations if "explanation" not in course]
+        if pending and engine.explanation_mode == "batch":
+            # One LLM call for the whole list instead of one stream per course
+            with st.spinner("Generating explanations..."):
+                explanations = engine.generate_batch_explanations(pending, preferences)
+            for course, explanation in zip(pending, explanations):
+                course["explanation"] = explanation
+            pending = []
+
+        placeholders = []
         for i, course in enumerate(recommendations, 1):
-            with st.expander(f"{i}. {course['title']}"):
+            # Expanded while its explanation is still being streamed in
+            with st.expander(f"{i}. {course['title']}", expanded="explanation" not in course):
                 cols = st.columns([5, 2, 2])
                 cols[0].markdown(f"**Category:** `{course['category']}`")
                 cols[1].markdown(f"**Difficulty:** `{course['difficulty'].capitalize()}`")
 
-                st.markdown(f"**Explanation:** {course['explanation']}")
+                if "explanation" in course:
+                    st.markdown(f"**Explanation:** {course['explanation']}")
+                else:
+                    placeholders.append(st.empty())
+                    placeholders[-1].markdown("**Explanation:** …")
                 st.markdown(f"**Similarity Score:** {course['similarity_score']:.2f}")
 
                 # YouTube Video Embed
-                search_query = f"{course['title']} introduction"
-                video_id = youtube_client.search_video(search_query)
+                video_id = video_ids.get(course['course_id'])
                 if video_id:
                     st.markdown("**🎥 YouTube Source:**")
                     st.video(f"https://www.youtube.com/embed/{video_id}")
                 else:
                     st.warning("No video found for this course.")
 
+        if pending:
+            # All explanations stream concurrently, each into its own expander
+            texts = [""] * len(pending)
+            for index, token in engine.stream_explanations(pending, preferences):
+                texts[index] += token
+                placeholders[index].markdown(f"**Explanation:** {texts[index]}")
+            for course, placeholder, text in zip(pending, placeholders, texts):
+                course["explanation"] = text.strip() or FALLBACK_EXPLANATION
+                placeholder.markdown(f"**Explanation:** {course['explanation']}")
+
                     # WhatsApp Option
         st.divider()
         st.subheader("📲 Send Recommendations via WhatsApp")
@@ -129,16 +192,18 @@ else:
                         msg += f"{i}. *{course['title']}* ({course['difficulty'].capitalize()})\n"
                         msg += f"{course['explanation']}\n"
 
-                        # Add YouTube search and link
-                        search_query = f"{course['title']} introduction"
-                        video_id = youtube_client.search_video(search_query)
+                        # Add YouTube link
+                        video_id = video_ids.get(course['course_id'])
                         if video_id:
                             msg += f"🎥 Watch: https://www.youtube.com/watch?v={video_id}\n"
 
                         msg += "---\n"
 
-                    send_whatsapp_message(phone_input.strip(), msg)
+                    # The dispatcher sends in the background; wait for the outcome so failures show up here
+                    send_whatsapp_message(phone_input.strip(), msg).result(timeout=WHATSAPP_SEND_TIMEOUT)
                     st.success("✅ Sent to WhatsApp!")
+                except DeliveryTimeout:
+                    st.info("⏳ Queued for WhatsApp; it will be delivered shortly.")
                 except Exception as e:
                     st.error(f"❌ Error sending message: {e}")
 
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import List
 
-@dataclass
+@dataclass(slots=True)
 class Course:
     id: str
     title: str
@@ -12,3 +12,4 @@ class Course:
     tags: List[str]
     rating: float
     price: float
+    students_enrolled: int = 0
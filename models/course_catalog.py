@@ -0,0 +1,126 @@
+from typing import Iterable, Iterator, List, Optional
+import numpy as np
+from models.course import Course
+
+
+class CourseCatalog:
+    """Column-oriented, indexed store of the course catalog.
+
+    Fields live in parallel columns instead of one object per course:
+    numeric fields in NumPy arrays, category and difficulty as small integer
+    codes into a shared vocabulary, and text fields in plain lists. A hash
+    index maps course IDs to row positions. ``Course`` objects are only built
+    on demand, so memory stays flat for catalogs with 100k+ rows.
+    """
+
+    def __init__(self, ids: List[str], titles: List[str], descriptions: List[str],
+                 categories: List[str], difficulties: List[str], durations, ratings, prices,
+                 tags: List[str], students_enrolled=None):
+        self.ids = list(ids)
+        self.titles = list(titles)
+        self.descriptions = list(descriptions)
+        self.durations = np.asarray(durations, dtype=np.int32)
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.students_enrolled = (np.asarray(students_enrolled, dtype=np.int64) if students_enrolled is not None
+                                  else np.zeros(len(self.ids), dtype=np.int64))
+        # Comma-joined, like the vector store metadata
+        self.tags = list(tags)
+
+        self.category_names, category_codes = np.unique(np.asarray(categories, dtype=object).astype(str),
+                                                        return_inverse=True)
+        self.difficulty_names, difficulty_codes = np.unique(np.asarray(difficulties, dtype=object).astype(str),
+                                                            return_inverse=True)
+        self.category_codes = category_codes.astype(np.int32)
+        self.difficulty_codes = difficulty_codes.astype(np.int32)
+
+        self._positions = {course_id: i for i, course_id in enumerate(self.ids)}
+        if len(self._positions) != len(self.ids):
+            raise ValueError("Course IDs in a catalog must be unique")
+
+    @classmethod
+    def from_courses(cls, courses: Iterable[Course]) -> "CourseCatalog":
+        courses = list(courses)
+        return cls(
+            ids=[c.id for c in courses],
+            titles=[c.title for c in courses],
+            descriptions=[c.description for c in courses],
+            categories=[c.category for c in courses],
+            difficulties=[c.difficulty for c in courses],
+            durations=[c.duration for c in courses],
+            ratings=[c.rating for c in courses],
+            prices=[c.price for c in courses],
+            tags=[','.join(c.tags) for c in courses],
+            students_enrolled=[c.students_enrolled for c in courses]
+        )
+
+    @classmethod
+    def from_frame(cls, frame) -> "CourseCatalog":
+        """Build a catalog straight from a normalized catalog DataFrame"""
+        return cls(
+            ids=frame['id'].tolist(),
+            titles=frame['title'].tolist(),
+            descriptions=frame['description'].tolist(),
+            categories=frame['category'].to_numpy(),
+            difficulties=frame['difficulty'].to_numpy(),
+            durations=frame['duration'].to_numpy(),
+            ratings=frame['rating'].to_numpy(),
+            prices=frame['price'].to_numpy(),
+            tags=frame['tags'].tolist(),
+            students_enrolled=frame['students_enrolled'].to_numpy()
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, course_id: str) -> bool:
+        return course_id in self._positions
+
+    def __iter__(self) -> Iterator[Course]:
+        for position in range(len(self.ids)):
+            yield self._course_at(position)
+
+    def position(self, course_id: str) -> Optional[int]:
+        return self._positions.get(course_id)
+
+    def _course_at(self, position: int) -> Course:
+        return Course(
+            id=self.ids[position],
+            title=self.titles[position],
+            description=self.descriptions[position],
+            category=str(self.category_names[self.category_codes[position]]),
+            difficulty=str(self.difficulty_names[self.difficulty_codes[position]]),
+            duration=int(self.durations[position]),
+            tags=self.tags[position].split(',') if self.tags[position] else [],
+            rating=float(self.ratings[position]),
+            price=float(self.prices[position]),
+            students_enrolled=int(self.students_enrolled[position])
+        )
+
+    def get(self, course_id: str) -> Optional[Course]:
+        """O(1) lookup of a course by ID"""
+        position = self._positions.get(course_id)
+        return self._course_at(position) if position is not None else None
+
+    def category_of(self, course_id: str) -> Optional[str]:
+        position = self._positions.get(course_id)
+        return str(self.category_names[self.category_codes[position]]) if position is not None else None
+
+    def difficulty_of(self, course_id: str) -> Optional[str]:
+        position = self._positions.get(course_id)
+        return str(self.difficulty_names[self.difficulty_codes[position]]) if position is not None else None
+
+    def most_enrolled(self, n: int, exclude: Iterable[str] = ()) -> List[Course]:
+        """The n courses with the most enrolled students, skipping excluded IDs"""
+        return self._top_by(self.students_enrolled, n, exclude)
+
+    def _top_by(self, column: np.ndarray, n: int, exclude: Iterable[str]) -> List[Course]:
+        excluded = {self._positions[c] for c in exclude if c in self._positions}
+        order = np.argsort(-column, kind='stable')
+        courses = []
+        for position in order:
+            if len(courses) >= n:
+                break
+            if position not in excluded:
+                courses.append(self._course_at(int(position)))
+        return courses
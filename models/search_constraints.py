@@ -0,0 +1,50 @@
+from dataclasses import dataclass, field
+from typing import Optional, Set
+
+
+@dataclass
+class SearchConstraints:
+    """Hard filters for vector search, pushed down as a metadata ``where`` clause"""
+    exclude_ids: Set[str] = field(default_factory=set)
+    difficulties: Optional[Set[str]] = None
+    categories: Optional[Set[str]] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+
+    def excludes_everything(self) -> bool:
+        """True when an empty difficulty or category set rules out every course"""
+        return self.difficulties == set() or self.categories == set()
+
+    def to_where(self) -> Optional[dict]:
+        """Chroma-style where clause, or None when nothing is constrained"""
+        conditions = []
+        if self.exclude_ids:
+            conditions.append({'course_id': {'$nin': sorted(self.exclude_ids)}})
+        if self.difficulties is not None:
+            conditions.append({'difficulty': {'$in': sorted(self.difficulties)}})
+        if self.categories is not None:
+            conditions.append({'category': {'$in': sorted(self.categories)}})
+        if self.max_price is not None:
+            conditions.append({'price': {'$lte': float(self.max_price)}})
+        if self.min_rating is not None:
+            conditions.append({'rating': {'$gte': float(self.min_rating)}})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {'$and': conditions}
+
+    def matches(self, course: dict) -> bool:
+        """Check a search result against the constraints"""
+        if course['course_id'] in self.exclude_ids:
+            return False
+        if self.difficulties is not None and course['difficulty'] not in self.difficulties:
+            return False
+        if self.categories is not None and course['category'] not in self.categories:
+            return False
+        if self.max_price is not None and course['price'] > self.max_price:
+            return False
+        if self.min_rating is not None and course['rating'] < self.min_rating:
+            return False
+        return True
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from typing import Dict, List
+from utils.logger import logger
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a piece of text used to detect catalog changes"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CatalogManifest:
+    """Tracks which course documents are already embedded in the vector store.
+
+    Each entry is keyed by course ID and holds a hash of the embedded text and a
+    hash of the stored metadata, so a re-ingest only has to embed rows whose
+    text changed and only has to rewrite metadata for rows whose fields changed.
+
+    ``checkpoint`` appends entries to a journal next to the manifest, so a
+    long ingest can record progress after every batch without rewriting the
+    whole file; ``save`` folds the journal back in.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self.load()
+
+    def load(self):
+        """Load the manifest and any journaled checkpoints, starting empty if it is missing or corrupt"""
+        if not os.path.exists(self.path):
+            self.entries = {}
+            self._replay_journal()
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable catalog manifest {self.path}: {e}")
+            self.entries = {}
+        self._replay_journal()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self.entries.update(json.loads(line))
+                except ValueError:
+                    break  # torn final line from an interrupted write
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def checkpoint(self, entries: Dict[str, Dict[str, str]]):
+        """Record entries durably by appending them to the journal"""
+        self.entries.update(entries)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entries) + "\n")
+
+    def clear(self):
+        self.entries = {}
+
+    def diff(self, fingerprints: Dict[str, Dict[str, str]]) -> Dict[str, List[str]]:
+        """Compare new fingerprints against the manifest.
+
+        Returns course IDs grouped into ``added``, ``updated`` (text changed,
+        needs re-embedding), ``metadata_only`` (same text, different fields)
+        and ``skipped`` (unchanged).
+        """
+        changes = {"added": [], "updated": [], "metadata_only": [], "skipped": []}
+        for course_id, fingerprint in fingerprints.items():
+            previous = self.entries.get(course_id)
+            if previous is None:
+                changes["added"].append(course_id)
+            elif previous.get("text") != fingerprint["text"]:
+                changes["updated"].append(course_id)
+            elif previous.get("meta") != fingerprint["meta"]:
+                changes["metadata_only"].append(course_id)
+            else:
+                changes["skipped"].append(course_id)
+        return changes
+
+    def missing(self, seen_ids: set) -> List[str]:
+        """Course IDs in the manifest that were not seen in the latest catalog"""
+        return [course_id for course_id in self.entries if course_id not in seen_ids]
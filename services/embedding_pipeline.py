@@ -0,0 +1,77 @@
+import time
+from typing import Callable, Iterator
+import numpy as np
+from services.encoder import get_encoder, DEFAULT_MODEL_NAME
+from utils.config import get_setting
+from utils.logger import logger
+
+
+class EmbeddingPipeline:
+    """Encodes documents in fixed-size batches, optionally across a CPU process pool.
+
+    ``iter_batches`` yields each batch's embeddings as soon as they are ready so
+    callers can write them out (and checkpoint) incrementally instead of
+    holding the whole catalog's vectors in memory. Throughput is logged and
+    kept in ``stats``. Without an explicit ``encoder`` the shared encoder for
+    ``model_name`` is loaded on the first batch.
+    """
+
+    def __init__(self, encoder=None, batch_size: int = None, num_processes: int = None,
+                 model_name: str = DEFAULT_MODEL_NAME):
+        self._encoder = encoder
+        self.model_name = model_name
+        self.batch_size = batch_size or get_setting("EMBED_BATCH_SIZE", 256, cast=int)
+        self.num_processes = num_processes or get_setting("EMBED_PROCESSES", 1, cast=int)
+        self._pool = None
+        self.reset_stats()
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = get_encoder(self.model_name)
+        return self._encoder
+
+    def reset_stats(self):
+        self.stats = {'documents': 0, 'seconds': 0.0, 'docs_per_sec': 0.0}
+
+    def _encode(self, documents: list[str]) -> np.ndarray:
+        # A process pool only pays off once there is enough work to spread out
+        pooled = hasattr(self.encoder, "start_multi_process_pool")
+        if pooled and self.num_processes > 1 and len(documents) >= 2 * self.num_processes:
+            if self._pool is None:
+                logger.info(f"Starting {self.num_processes} embedding worker processes")
+                self._pool = self.encoder.start_multi_process_pool(["cpu"] * self.num_processes)
+            chunk_size = max(1, len(documents) // self.num_processes)
+            return np.asarray(self.encoder.encode(documents, pool=self._pool, chunk_size=chunk_size))
+        return np.asarray(self.encoder.encode(documents, batch_size=min(len(documents), 64)))
+
+    def iter_batches(self, documents: list[str],
+                     progress: Callable[[int, int], None] = None) -> Iterator[tuple[int, np.ndarray]]:
+        """Yield ``(start, embeddings)`` for consecutive batches of ``documents``"""
+        total = len(documents)
+        for start in range(0, total, self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            batch_started = time.perf_counter()
+            embeddings = self._encode(batch)
+            self.stats['documents'] += len(batch)
+            self.stats['seconds'] += time.perf_counter() - batch_started
+            if self.stats['seconds'] > 0:
+                self.stats['docs_per_sec'] = self.stats['documents'] / self.stats['seconds']
+            done = start + len(batch)
+            logger.info(f"Embedded {done}/{total} documents ({self.stats['docs_per_sec']:.1f} docs/sec)")
+            if progress:
+                progress(done, total)
+            yield start, embeddings
+
+    def encode(self, documents: list[str]) -> np.ndarray:
+        """Encode all documents batch by batch and return one matrix"""
+        batches = [embeddings for _, embeddings in self.iter_batches(documents)]
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack(batches)
+
+    def close(self):
+        """Stop the worker processes, if any were started"""
+        if self._pool is not None:
+            self.encoder.stop_multi_process_pool(self._pool)
+            self._pool = None
@@ -0,0 +1,54 @@
+import threading
+from utils.config import get_setting
+from utils.logger import logger
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+ENCODER_BACKENDS = ("torch", "onnx")
+
+_encoders = {}
+_lock = threading.Lock()
+
+
+def encoder_id(model_name: str = DEFAULT_MODEL_NAME) -> str:
+    """Identify the configured encoder; vectors from different IDs aren't interchangeable.
+
+    ``ENCODER_BACKEND=onnx`` runs an export of the model from
+    ``ENCODER_ONNX_DIR`` (``ENCODER_ONNX_FILE`` picks the float32 or int8
+    graph) instead of the PyTorch model.
+    """
+    backend = get_setting("ENCODER_BACKEND", "torch")
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}")
+    if backend == "onnx":
+        return f"{model_name}:onnx:{get_setting('ENCODER_ONNX_FILE', 'model.onnx')}"
+    return model_name
+
+
+def get_encoder(model_name: str = DEFAULT_MODEL_NAME):
+    """Return the process-wide encoder for a model, loading it on first use.
+
+    Ingestion and query-time search must share one encoder so stored course
+    vectors and query vectors live in the same space and the model is only
+    held in memory once. sentence_transformers (and torch) are only imported
+    here, and not at all with the ONNX backend, so processes that never embed
+    anything don't pay for them.
+    """
+    key = encoder_id(model_name)
+    encoder = _encoders.get(key)
+    if encoder is None:
+        with _lock:
+            encoder = _encoders.get(key)
+            if encoder is None:
+                logger.info(f"Loading sentence encoder {key}")
+                if key != model_name:
+                    from services.onnx_encoder import OnnxEncoder
+                    encoder = OnnxEncoder(
+                        get_setting("ENCODER_ONNX_DIR", f"onnx_models/{model_name}"),
+                        model_file=get_setting("ENCODER_ONNX_FILE", "model.onnx"),
+                        num_threads=get_setting("ENCODER_THREADS", None, cast=int)
+                    )
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    encoder = SentenceTransformer(model_name)
+                _encoders[key] = encoder
+    return encoder
@@ -0,0 +1,189 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from services.numpy_index import NumpyVectorIndex, DTYPES
+from services.vector_store import HNSW_DEFAULTS, open_chroma_collection, set_search_ef
+from utils.logger import logger
+
+
+def normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[list[int]]:
+    """Ground-truth top-k rows by cosine similarity for each query"""
+    scores = normalize(queries) @ normalize(vectors).T
+    top = np.argpartition(-scores, min(k, len(vectors)) - 1, axis=1)[:, :k]
+    return [list(row[np.argsort(-scores[i, row], kind='stable')]) for i, row in enumerate(top)]
+
+
+def recall_at_k(expected: list[list[int]], found: list[list[int]], k: int) -> float:
+    """Fraction of the true top-k neighbours that were returned, averaged over queries"""
+    hits = [len(set(truth[:k]) & set(result[:k])) / min(k, len(truth)) for truth, result in zip(expected, found)]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def synthetic_vectors(count: int, dim: int = 384, clusters: int = 100, seed: int = 0) -> np.ndarray:
+    """Clustered random unit vectors, a stand-in for embeddings of a large catalog"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim))
+    return normalize(vectors)
+
+
+def catalog_vectors(csv_path: str, num_queries: int) -> tuple[np.ndarray, np.ndarray]:
+    """Embed the course catalog with the configured encoder; course titles serve as queries"""
+    from engine.catalog_loader import load_catalog_frame, frame_to_courses
+    from services.encoder import get_encoder
+    from services.vector_store import VectorStore
+
+    courses = frame_to_courses(load_catalog_frame(csv_path))
+    encoder = get_encoder()
+    vectors = encoder.encode([VectorStore.course_document(course) for course in courses], batch_size=64)
+    queries = encoder.encode([course.title for course in courses[:num_queries]])
+    return normalize(vectors), normalize(queries)
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def time_queries(collection, queries: np.ndarray, k: int) -> tuple[list[list[int]], list[float]]:
+    """Run queries one at a time, as the recommender does, returning row numbers and latencies"""
+    # Warm up first so loading the index from disk isn't counted as query latency
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k)
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - started)
+        found.append([int(course_id) for course_id in result['ids'][0]])
+    return found, latencies
+
+
+def result_row(index: str, params: str, expected, found, latencies, k, build_seconds, size_bytes) -> dict:
+    return {
+        'index': index,
+        'params': params,
+        f'recall@{k}': recall_at_k(expected, found, k),
+        'mean_ms': 1000 * float(np.mean(latencies)),
+        'p95_ms': 1000 * float(np.percentile(latencies, 95)),
+        'build_s': build_seconds,
+        'size_mb': size_bytes / 2 ** 20
+    }
+
+
+def benchmark_numpy(vectors, queries, expected, k, dtype, workdir) -> dict:
+    path = os.path.join(workdir, f"numpy_{dtype}")
+    started = time.perf_counter()
+    index = NumpyVectorIndex(path, "bench", dtype=dtype)
+    index.upsert(ids=[str(i) for i in range(len(vectors))], embeddings=vectors)
+    build_seconds = time.perf_counter() - started
+    found, latencies = time_queries(index, queries, k)
+    return result_row("numpy", f"dtype={dtype}", expected, found, latencies, k, build_seconds, directory_size(path))
+
+
+def benchmark_chroma(vectors, queries, expected, k, m, construction_ef, search_efs, workdir) -> list[dict]:
+    """Build one HNSW graph and measure it at every ``search_ef``"""
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+
+    path = os.path.join(workdir, f"chroma_m{m}_ef{construction_ef}")
+    hnsw = {'M': m, 'construction_ef': construction_ef, 'search_ef': search_efs[0]}
+    started = time.perf_counter()
+    client = chromadb.PersistentClient(path=path)
+    collection = open_chroma_collection(client, "bench", hnsw)
+    ids = [str(i) for i in range(len(vectors))]
+    batch_size = client.get_max_batch_size() if hasattr(client, "get_max_batch_size") else 5000
+    for start in range(0, len(vectors), batch_size):
+        collection.add(ids=ids[start:start + batch_size], embeddings=vectors[start:start + batch_size].tolist())
+    build_seconds = time.perf_counter() - started
+
+    rows = []
+    for search_ef in search_efs:
+        if search_ef != hnsw['search_ef']:
+            if not set_search_ef(collection, search_ef):
+                continue
+            # Chroma only picks up a new search_ef when it loads the index again
+            SharedSystemClient.clear_system_cache()
+            client = chromadb.PersistentClient(path=path)
+            collection = client.get_collection("bench")
+            hnsw['search_ef'] = search_ef
+        found, latencies = time_queries(collection, queries, k)
+        params = f"M={m} construction_ef={construction_ef} search_ef={search_ef}"
+        rows.append(result_row("chroma", params, expected, found, latencies, k, build_seconds, directory_size(path)))
+    SharedSystemClient.clear_system_cache()
+    return rows
+
+
+def benchmark(vectors, queries, k: int = 10, dtypes=DTYPES, ms=(HNSW_DEFAULTS['M'],),
+              construction_efs=(HNSW_DEFAULTS['construction_ef'],), search_efs=(HNSW_DEFAULTS['search_ef'],),
+              chroma: bool = True, workdir: str = None) -> list[dict]:
+    """Measure recall@k and per-query latency of each index configuration.
+
+    The numpy backend is measured for every ``dtypes`` entry and, with
+    ``chroma``, an HNSW collection is built for every ``ms`` and
+    ``construction_efs`` combination and queried at every ``search_efs``.
+    Recall is against exact float32 search over the same vectors.
+    """
+    vectors, queries = normalize(vectors), normalize(queries)
+    expected = exact_neighbours(vectors, queries, k)
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="index_benchmark_")
+    try:
+        rows = [benchmark_numpy(vectors, queries, expected, k, dtype, workdir) for dtype in dtypes]
+        if chroma:
+            for m in ms:
+                for construction_ef in construction_efs:
+                    logger.info(f"Building HNSW index M={m} construction_ef={construction_ef}")
+                    rows.extend(benchmark_chroma(vectors, queries, expected, k, m, construction_ef,
+                                                 list(search_efs), workdir))
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def format_report(rows: list[dict]) -> str:
+    if not rows:
+        return ""
+    columns = list(rows[0])
+    cells = [[f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(line[i]) for line in cells)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(value.ljust(w) for value, w in zip(line, widths)) for line in cells]
+    return "\n".join(lines)
+
+
+def _ints(text: str) -> list[int]:
+    return [int(value) for value in text.split(",")]
+
+
+if __name__ == "__main__":
+    # Offline report: python -m services.index_benchmark [--synthetic 1000000] [--ef-search 10,50,100]
+    parser = argparse.ArgumentParser(description="Recall@k vs latency for vector index settings")
+    parser.add_argument("--csv", default="data/coursea_data.csv", help="catalog to embed as the corpus")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the catalog")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtypes", default=",".join(DTYPES))
+    parser.add_argument("--m", type=_ints, default=[HNSW_DEFAULTS['M']])
+    parser.add_argument("--ef-construction", type=_ints, default=[HNSW_DEFAULTS['construction_ef']])
+    parser.add_argument("--ef-search", type=_ints, default=[10, 50, HNSW_DEFAULTS['search_ef'], 200])
+    parser.add_argument("--no-chroma", action="store_true")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus = synthetic_vectors(args.synthetic + args.queries, args.dim)
+        corpus, query_vectors = corpus[args.queries:], corpus[:args.queries]
+    else:
+        corpus, query_vectors = catalog_vectors(args.csv, args.queries)
+    print(format_report(benchmark(corpus, query_vectors, args.k, args.dtypes.split(","), args.m,
+                                  args.ef_construction, args.ef_search, chroma=not args.no_chroma)))
@@ -0,0 +1,130 @@
+import queue
+import threading
+from typing import Callable, Hashable
+from utils.fork import register_after_fork
+from utils.logger import logger
+
+QUEUED = "queued"
+DUPLICATE = "duplicate"
+FULL = "full"
+
+
+class JobQueue:
+    """Bounded in-process job queue drained by a fixed pool of worker threads.
+
+    ``submit`` never blocks: it returns ``"full"`` once ``max_depth`` jobs are
+    waiting (backpressure) and ``"duplicate"`` while a job with the same key
+    is still waiting to start, so a user can't stack up identical work.
+    Failed jobs are retried up to ``max_retries`` times with exponential
+    backoff. The retry is re-queued by a timer rather than slept on, so a
+    worker is free to run other jobs meanwhile. A job that has already sent
+    something (see ``mark_output``) is not retried, since running it again
+    would send it twice.
+    """
+
+    def __init__(self, num_workers: int = 4, max_depth: int = 100, max_retries: int = 2,
+                 retry_backoff: float = 1.0, name: str = "jobs"):
+        self.num_workers = num_workers
+        self.max_depth = max_depth
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.name = name
+        self._start()
+        # Threads don't survive a fork, so each pre-forked worker starts its own pool
+        register_after_fork(self._start)
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.max_depth)
+        self._pending = set()
+        self._lock = threading.Lock()
+        # Signalled whenever a scheduled retry has been put back on the queue
+        self._requeued = threading.Condition(self._lock)
+        self._scheduled = 0
+        self._local = threading.local()
+        self._counters = {'submitted': 0, 'deduplicated': 0, 'rejected': 0,
+                          'completed': 0, 'failed': 0, 'retried': 0}
+        self.in_flight = 0
+        self._workers = [
+            threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, key: Hashable, fn: Callable, *args, **kwargs) -> str:
+        """Queue ``fn(*args, **kwargs)`` under ``key`` and report whether it was accepted"""
+        with self._lock:
+            if key in self._pending:
+                self._counters['deduplicated'] += 1
+                return DUPLICATE
+            try:
+                self._queue.put_nowait((key, fn, args, kwargs, 0))
+            except queue.Full:
+                self._counters['rejected'] += 1
+                logger.warning(f"Job queue full ({self._queue.qsize()} waiting), rejecting job {key}")
+                return FULL
+            self._pending.add(key)
+            self._counters['submitted'] += 1
+            return QUEUED
+
+    def _work(self):
+        while True:
+            key, fn, args, kwargs, attempt = self._queue.get()
+            with self._lock:
+                self._pending.discard(key)
+                self.in_flight += 1
+            self._local.output = False
+            try:
+                self._run(key, fn, args, kwargs, attempt)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                self._queue.task_done()
+
+    def mark_output(self):
+        """Called from a running job once it has sent something; it won't be retried after that"""
+        self._local.output = True
+
+    def _run(self, key, fn, args, kwargs, attempt):
+        try:
+            fn(*args, **kwargs)
+            with self._lock:
+                self._counters['completed'] += 1
+            return
+        except Exception as e:
+            if attempt == self.max_retries or self._local.output:
+                logger.error(f"Job {key} failed after {attempt + 1} attempts: {e}")
+                with self._lock:
+                    self._counters['failed'] += 1
+                return
+            logger.warning(f"Job {key} failed, retrying: {e}")
+            with self._lock:
+                self._counters['retried'] += 1
+                # Counts as waiting, so the same work can't be submitted again meanwhile
+                self._pending.add(key)
+                self._scheduled += 1
+            timer = threading.Timer(self.retry_backoff * 2 ** attempt, self._requeue,
+                                    args=((key, fn, args, kwargs, attempt + 1),))
+            timer.daemon = True
+            timer.start()
+
+    def _requeue(self, job):
+        # Blocks this timer thread, not a worker, if the queue is full
+        self._queue.put(job)
+        with self._requeued:
+            self._scheduled -= 1
+            self._requeued.notify_all()
+
+    def join(self):
+        """Block until every queued job, including scheduled retries, has finished"""
+        while True:
+            self._queue.join()
+            with self._requeued:
+                if not self._scheduled:
+                    return
+                self._requeued.wait()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, 'depth': self._queue.qsize(), 'in_flight': self.in_flight,
+                    'scheduled': self._scheduled}
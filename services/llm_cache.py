@@ -0,0 +1,178 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+from utils.fork import register_after_fork
+from utils.logger import logger
+
+
+class LLMResponseCache:
+    """Disk-backed SQLite cache of LLM responses.
+
+    Entries are keyed by model name plus a hash of the whitespace-normalized
+    prompt, expire after ``ttl_seconds`` and are evicted least-recently-used
+    first once the cache holds more than ``max_entries`` rows.
+
+    Each thread keeps one connection in WAL mode, so reads don't wait on
+    writers in other threads or processes. A hit does not write: access
+    times are collected in memory and written in one batch before the next
+    eviction, or once ``touch_batch`` keys or ``touch_interval`` seconds
+    have built up.
+    """
+
+    def __init__(self, db_path: str = "llm_cache.db", max_entries: int = 5000,
+                 ttl_seconds: int = 7 * 24 * 3600, touch_batch: int = 100, touch_interval: float = 60.0):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # cache_key -> (last access time, hits since the last flush)
+        self._touched: dict[str, tuple[float, int]] = {}
+        self._flushed_at = time.monotonic()
+        self._local = threading.local()
+        self._inherited = []
+        # A forked worker must not reuse the parent's SQLite handles
+        register_after_fork(self._drop_inherited_connections)
+        self.init_database()
+
+    def _drop_inherited_connections(self):
+        # Kept referenced rather than closed, like DatabaseManager: closing a
+        # handle the parent still uses can checkpoint or remove its WAL files
+        self._inherited.append(self._local)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """This thread's connection, opened in WAL mode on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                created_at REAL,
+                last_accessed REAL,
+                hit_count INTEGER DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_accessed ON llm_responses (last_accessed)")
+        conn.commit()
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Collapse whitespace so indentation changes don't split cache entries"""
+        return re.sub(r"\s+", " ", prompt).strip()
+
+    @classmethod
+    def make_key(cls, model: str, prompt: str) -> str:
+        prompt_hash = hashlib.sha256(cls.normalize_prompt(prompt).encode("utf-8")).hexdigest()
+        return f"{model}:{prompt_hash}"
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """Return a cached response, or None on a miss or an expired entry"""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        try:
+            row = self._connect().execute(
+                "SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache read failed: {e}")
+            row = None
+        # Expired rows are left for the next eviction to remove
+        if row and now - row[1] <= self.ttl_seconds:
+            with self._lock:
+                self.hits += 1
+                hits = self._touched.get(key, (now, 0))[1]
+                self._touched[key] = (now, hits + 1)
+                due = (len(self._touched) >= self.touch_batch
+                       or time.monotonic() - self._flushed_at >= self.touch_interval)
+            if due:
+                self.flush_access_times()
+            return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _write_access_times(self, conn: sqlite3.Connection):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._flushed_at = time.monotonic()
+        if touched:
+            conn.executemany(
+                "UPDATE llm_responses SET last_accessed = ?, hit_count = hit_count + ? WHERE cache_key = ?",
+                [(accessed, hits, key) for key, (accessed, hits) in touched.items()]
+            )
+
+    def flush_access_times(self):
+        """Write the access times collected from hits in one transaction"""
+        conn = self._connect()
+        try:
+            self._write_access_times(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.warning(f"LLM cache access time update failed: {e}")
+
+    def set(self, model: str, prompt: str, response: str):
+        """Store a response and evict expired or least-recently-used entries"""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Pending access times go in first so eviction sees recent hits
+            self._write_access_times(conn)
+            conn.execute("""
+                INSERT OR REPLACE INTO llm_responses (cache_key, model, response, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, model, response, now, now))
+            self._evict(conn, now)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        conn.execute("""
+            DELETE FROM llm_responses WHERE cache_key IN (
+                SELECT cache_key FROM llm_responses
+                ORDER BY last_accessed DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM llm_responses")
+        conn.commit()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self._touched = {}
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the number of stored entries"""
+        entries = self._connect().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries
+            }
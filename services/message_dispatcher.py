@@ -0,0 +1,201 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+from utils.fork import register_after_fork
+from utils.logger import logger
+
+# Twilio rejects WhatsApp bodies longer than this
+MAX_MESSAGE_LENGTH = 1600
+
+
+class TokenBucket:
+    """Allows ``rate`` operations per second on average, with bursts up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> list[str]:
+    """Split text into chunks of at most ``limit`` characters, preferring line breaks"""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class MessageDispatcher:
+    """Queues outbound messages and delivers them from a background thread.
+
+    ``send`` returns immediately with a future that resolves once the
+    message is delivered, or fails once it has been given up on. Messages to the same recipient that are
+    queued within ``coalesce_window`` seconds of each other go out as one
+    message (split again only if they exceed the provider's length limit),
+    in the order they were queued. Deliveries are paced by a token bucket.
+    A failing delivery is rescheduled up to ``max_retries`` times with
+    exponential backoff; the sender keeps serving other recipients in the
+    meantime, while that recipient's later messages wait so order holds.
+
+    ``transport(to, body)`` performs the actual delivery and must raise on
+    failure.
+    """
+
+    def __init__(self, transport: Callable[[str, str], object], rate_per_second: float = 1.0,
+                 burst: float = None, max_retries: int = 3, retry_backoff: float = 1.0,
+                 coalesce_window: float = 0.5, max_length: int = MAX_MESSAGE_LENGTH):
+        self.transport = transport
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.coalesce_window = coalesce_window
+        self.max_length = max_length
+        self._start()
+        # The sender thread doesn't survive a fork, so each worker starts its own
+        register_after_fork(self._start)
+
+    def _start(self):
+        self.bucket = TokenBucket(self.rate_per_second, self.burst)
+        # recipient -> (time of the oldest waiting message, waiting bodies, their futures)
+        self._pending: "OrderedDict[str, tuple[float, list[str], list[Future]]]" = OrderedDict()
+        # Heap of (not_before, sequence, recipient, undelivered chunks, attempt, futures)
+        self._retries: list = []
+        self._retrying: set[str] = set()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._sending = 0
+        self._counters = {'queued': 0, 'delivered': 0, 'coalesced': 0, 'retried': 0, 'failed': 0}
+        self._thread = threading.Thread(target=self._run, name="message-dispatcher", daemon=True)
+        self._thread.start()
+
+    def send(self, to: str, body: str) -> Future:
+        """Queue a message for delivery; the returned future reports the outcome"""
+        delivery = Future()
+        if not body:
+            delivery.set_result(True)
+            return delivery
+        with self._condition:
+            entry = self._pending.get(to)
+            if entry is None:
+                self._pending[to] = (time.monotonic(), [body], [delivery])
+            else:
+                entry[1].append(body)
+                entry[2].append(delivery)
+            self._counters['queued'] += 1
+            self._condition.notify_all()
+        return delivery
+
+    def _next_batch(self) -> tuple[str, list[str], int, list[Future]]:
+        """Wait for a due retry or a closed coalescing window and take that work"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wake = None
+                if self._retries:
+                    not_before, _, to, chunks, attempt, futures = self._retries[0]
+                    if not_before <= now:
+                        heapq.heappop(self._retries)
+                        self._retrying.discard(to)
+                        self._sending += 1
+                        return to, chunks, attempt, futures
+                    wake = not_before
+                for to, (queued_at, _, _) in self._pending.items():
+                    if to in self._retrying:
+                        continue
+                    due = queued_at + self.coalesce_window
+                    if due <= now:
+                        _, bodies, futures = self._pending.pop(to)
+                        self._counters['coalesced'] += len(bodies) - 1
+                        self._sending += 1
+                        return to, split_message("\n\n".join(bodies), self.max_length), 0, futures
+                    wake = due if wake is None else min(wake, due)
+                    # Later recipients were queued later, so they aren't due sooner
+                    break
+                self._condition.wait(None if wake is None else wake - now)
+
+    def _run(self):
+        while True:
+            to, chunks, attempt, futures = self._next_batch()
+            try:
+                self._deliver(to, chunks, attempt, futures)
+            finally:
+                with self._condition:
+                    self._sending -= 1
+                    self._condition.notify_all()
+
+    def _deliver(self, to: str, chunks: list[str], attempt: int, futures: list[Future]):
+        """Deliver chunks in order; on failure reschedule the rest instead of blocking the sender"""
+        error = None
+        for i, body in enumerate(chunks):
+            self.bucket.acquire()
+            try:
+                self.transport(to, body)
+            except Exception as e:
+                if attempt < self.max_retries:
+                    logger.warning(f"Sending message to {to} failed, retrying: {e}")
+                    with self._condition:
+                        self._counters['retried'] += 1
+                        not_before = time.monotonic() + self.retry_backoff * 2 ** attempt
+                        heapq.heappush(self._retries, (not_before, next(self._sequence), to, chunks[i:], attempt + 1,
+                                                       futures))
+                        self._retrying.add(to)
+                    return
+                logger.error(f"Failed to send message to {to} after {attempt + 1} attempts: {e}")
+                error = e
+                with self._condition:
+                    self._counters['failed'] += 1
+            else:
+                with self._condition:
+                    self._counters['delivered'] += 1
+            attempt = 0
+        for delivery in futures:
+            if error is None:
+                delivery.set_result(True)
+            else:
+                delivery.set_exception(error)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every queued message has been delivered or given up on"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._retries or self._sending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                **self._counters,
+                'depth': sum(len(bodies) for _, bodies in self._pending.values()),
+                'recipients_waiting': len(self._pending),
+                'retrying': len(self._retries)
+            }
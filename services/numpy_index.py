@@ -0,0 +1,415 @@
+import json
+import os
+import sys
+import threading
+from typing import Optional
+import numpy as np
+from utils.logger import logger
+
+DTYPES = ("float32", "float16")
+# Rows scored per matrix product; keeps the float32 copy of float16 rows cache-sized
+SCORE_CHUNK_ROWS = 2048
+
+
+class NumpyVectorIndex:
+    """In-process exact cosine search over a memory-mapped matrix of course vectors.
+
+    Vectors are L2-normalized rows stored in ``<name>_vectors.npy`` and
+    opened with ``mmap_mode='r'``, so several processes share the same pages.
+    Metadata is kept column-oriented (one list per field) in
+    ``<name>_metadata.json`` and only turned back into dicts for the rows a
+    query returns.
+
+    Each write normally rewrites the files. Between ``begin_bulk`` and
+    ``end_bulk`` (a catalog sync) writes are instead staged in memory and
+    appended to a ``<name>_pending`` sidecar, and the index is rewritten
+    once at the end; a sidecar left behind by an interrupted load is
+    replayed the next time the index is opened. Queries during a bulk load
+    see the staged rows in memory but never write the index themselves.
+
+    With ``dtype="float16"`` the vectors are stored at half precision, which
+    halves the file and the memory it maps; rows are converted back to
+    float32 a chunk at a time while scoring. An index stored at another
+    dtype is refused rather than rewritten, since other processes may have
+    it mapped; ``convert`` migrates it explicitly.
+
+    The methods mirror the subset of the Chroma collection API that
+    ``VectorStore`` uses, and ``query`` returns results in the same shape.
+    """
+
+    def __init__(self, path: str, name: str, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}', expected one of {DTYPES}")
+        self.path = path
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.vectors_path = os.path.join(path, f"{name}_vectors.npy")
+        self.metadata_path = os.path.join(path, f"{name}_metadata.json")
+        self.pending_vectors_path = os.path.join(path, f"{name}_pending.f32")
+        self.pending_log_path = os.path.join(path, f"{name}_pending.jsonl")
+        self.ids: list[str] = []
+        self.documents: list[str] = []
+        self.columns: dict[str, list] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._positions: dict[str, int] = {}
+        # position -> float32 row written since the last save
+        self._staged: dict[int, np.ndarray] = {}
+        self._bulk = False
+        # A catalog sync may write while request threads query
+        self._lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """Load the index from disk, starting empty if nothing is stored yet"""
+        self._load_stored()
+        self._replay_pending()
+
+    def _load_stored(self):
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.metadata_path)):
+            return
+        try:
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            vectors = np.load(self.vectors_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable vector index {self.vectors_path}: {e}")
+            return
+        if len(table["ids"]) != vectors.shape[0]:
+            logger.warning(f"Vector index {self.vectors_path} does not match its metadata, ignoring it")
+            return
+        if vectors.dtype != self.dtype:
+            raise ValueError(
+                f"Vector index {self.vectors_path} is stored as {vectors.dtype} but {self.dtype} was requested; "
+                f"set VECTOR_DTYPE={vectors.dtype} or stop every process using it and run "
+                f"'python -m services.numpy_index {self.path} {self.name} {self.dtype}'"
+            )
+        self.ids = table["ids"]
+        self.documents = table["documents"]
+        self.columns = table["columns"]
+        self.vectors = vectors
+        self._positions = {course_id: i for i, course_id in enumerate(self.ids)}
+
+    @staticmethod
+    def stored_dtype(path: str, name: str) -> Optional[str]:
+        """Dtype of the vectors stored for ``name`` under ``path``, or None if there are none"""
+        try:
+            return str(np.load(os.path.join(path, f"{name}_vectors.npy"), mmap_mode='r').dtype)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def convert(cls, path: str, name: str, dtype: str) -> "NumpyVectorIndex":
+        """Rewrite a stored index at ``dtype``; processes still mapping the old file must be restarted.
+
+        Normalized vectors convert either way without re-embedding.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}', expected one of {DTYPES}")
+        stored = cls.stored_dtype(path, name)
+        index = cls(path, name, dtype=stored if stored in DTYPES else dtype)
+        if index.dtype != np.dtype(dtype):
+            logger.info(f"Converting vector index {index.vectors_path} from {index.dtype} to {dtype}")
+            index.dtype = np.dtype(dtype)
+            index._write()
+        return index
+
+    def save(self):
+        """Atomically persist vectors and metadata, then re-open the vectors memory-mapped"""
+        os.makedirs(self.path, exist_ok=True)
+        tmp_vectors = f"{self.vectors_path}.tmp.npy"
+        tmp_metadata = f"{self.metadata_path}.tmp"
+        np.save(tmp_vectors, np.ascontiguousarray(self.vectors, dtype=self.dtype))
+        with open(tmp_metadata, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "documents": self.documents, "columns": self.columns}, f)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_metadata, self.metadata_path)
+        self.vectors = np.load(self.vectors_path, mmap_mode='r')
+
+    def begin_bulk(self):
+        """Stage writes until ``end_bulk`` instead of rewriting the index on every call"""
+        with self._lock:
+            self._bulk = True
+
+    def end_bulk(self):
+        """Write everything staged since ``begin_bulk`` in one pass"""
+        with self._lock:
+            self._bulk = False
+            if self._staged or os.path.exists(self.pending_log_path):
+                self._write()
+
+    def _dimension(self) -> int:
+        if self.vectors.shape[0]:
+            return self.vectors.shape[1]
+        if self._staged:
+            return len(next(iter(self._staged.values())))
+        return 0
+
+    def _fold(self):
+        """Merge staged rows into the in-memory vector matrix"""
+        if self._staged or self.vectors.shape[0] != len(self.ids):
+            matrix = np.zeros((len(self.ids), self._dimension()), dtype=np.float32)
+            if self.vectors.shape[0]:
+                matrix[:self.vectors.shape[0]] = self.vectors
+            for position, vector in self._staged.items():
+                matrix[position] = vector
+            self.vectors = matrix
+            self._staged = {}
+
+    def _write(self):
+        """Fold staged rows into the vector matrix and persist the index"""
+        self._fold()
+        self.save()
+        # Everything staged is in the main files now
+        for pending in (self.pending_log_path, self.pending_vectors_path):
+            if os.path.exists(pending):
+                os.remove(pending)
+
+    def _log_pending(self, ids: list[str], vectors, documents: list[str], metadatas: list[dict]):
+        """Append staged writes to the sidecar so an interrupted bulk load can resume"""
+        os.makedirs(self.path, exist_ok=True)
+        first_row = 0
+        if vectors is not None:
+            if os.path.exists(self.pending_vectors_path):
+                first_row = os.path.getsize(self.pending_vectors_path) // (4 * vectors.shape[1])
+            with open(self.pending_vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.pending_log_path, "a", encoding="utf-8") as f:
+            for i, course_id in enumerate(ids):
+                record = {"id": course_id}
+                if vectors is not None:
+                    record.update(row=first_row + i, dim=vectors.shape[1])
+                if documents is not None:
+                    record["document"] = documents[i]
+                if metadatas is not None:
+                    record["metadata"] = metadatas[i]
+                f.write(json.dumps(record) + "\n")
+
+    def _replay_pending(self):
+        """Apply writes left in the sidecar by an interrupted bulk load and fold them in"""
+        if not os.path.exists(self.pending_log_path):
+            return
+        vectors = np.zeros(0, dtype=np.float32)
+        if os.path.exists(self.pending_vectors_path):
+            vectors = np.fromfile(self.pending_vectors_path, dtype=np.float32)
+        applied = 0
+        with open(self.pending_log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn final line
+                row, dim = record.get("row"), record.get("dim")
+                if row is not None and (row + 1) * dim > len(vectors):
+                    break
+                position = self._assign(
+                    [record["id"]],
+                    [record["document"]] if "document" in record else None,
+                    [record["metadata"]] if "metadata" in record else None
+                )[0]
+                if row is not None:
+                    self._staged[position] = vectors[row * dim:(row + 1) * dim]
+                applied += 1
+        logger.info(f"Recovered {applied} writes from an interrupted bulk load of {self.vectors_path}")
+        self._write()
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _metadata_at(self, position: int) -> dict:
+        return {key: values[position] for key, values in self.columns.items()}
+
+    def _set_metadata(self, position: int, metadata: dict):
+        for key in set(self.columns) | set(metadata):
+            column = self.columns.setdefault(key, [None] * len(self.ids))
+            column[position] = metadata.get(key)
+
+    def _assign(self, ids: list[str], documents: list[str] = None, metadatas: list[dict] = None) -> list[int]:
+        """Set documents and metadata of rows, appending new ones; returns their positions"""
+        positions = []
+        for i, course_id in enumerate(ids):
+            position = self._positions.get(course_id)
+            if position is None:
+                position = len(self.ids)
+                self._positions[course_id] = position
+                self.ids.append(course_id)
+                self.documents.append("")
+                for column in self.columns.values():
+                    column.append(None)
+            if documents is not None:
+                self.documents[position] = documents[i]
+            if metadatas is not None:
+                self._set_metadata(position, metadatas[i])
+            positions.append(position)
+        return positions
+
+    def upsert(self, ids: list[str], embeddings, documents: list[str] = None, metadatas: list[dict] = None):
+        """Insert new rows or overwrite existing ones"""
+        with self._lock:
+            if not ids:
+                return
+            vectors = self._normalize(embeddings)
+            dimension = self._dimension()
+            if dimension and dimension != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {dimension}")
+
+            if self._bulk:
+                self._log_pending(ids, vectors, documents, metadatas)
+            positions = self._assign(ids, documents, metadatas)
+            self._staged.update(zip(positions, vectors))
+            if not self._bulk:
+                self._write()
+
+    def add(self, ids: list[str], embeddings, documents: list[str] = None, metadatas: list[dict] = None):
+        with self._lock:
+            duplicates = [course_id for course_id in ids if course_id in self._positions]
+            if duplicates:
+                logger.warning(f"Skipping {len(duplicates)} IDs already in the vector index")
+                keep = [i for i, course_id in enumerate(ids) if course_id not in self._positions]
+                ids = [ids[i] for i in keep]
+                embeddings = [embeddings[i] for i in keep]
+                documents = [documents[i] for i in keep] if documents is not None else None
+                metadatas = [metadatas[i] for i in keep] if metadatas is not None else None
+            self.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update(self, ids: list[str], metadatas: list[dict] = None, documents: list[str] = None):
+        """Update documents or metadata of existing rows without touching their vectors"""
+        with self._lock:
+            keep = [i for i, course_id in enumerate(ids) if course_id in self._positions]
+            ids = [ids[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep] if metadatas is not None else None
+            documents = [documents[i] for i in keep] if documents is not None else None
+            if self._bulk:
+                self._log_pending(ids, None, documents, metadatas)
+            self._assign(ids, documents, metadatas)
+            if not self._bulk:
+                self._write()
+
+    def delete(self, ids: list[str]):
+        with self._lock:
+            doomed = {self._positions[course_id] for course_id in ids if course_id in self._positions}
+            if not doomed:
+                return
+            if self._staged:
+                self._write()
+            keep = [i for i in range(len(self.ids)) if i not in doomed]
+            self.vectors = np.array(self.vectors, dtype=np.float32)[keep]
+            self.ids = [self.ids[i] for i in keep]
+            self.documents = [self.documents[i] for i in keep]
+            self.columns = {key: [values[i] for i in keep] for key, values in self.columns.items()}
+            self._positions = {course_id: i for i, course_id in enumerate(self.ids)}
+            self.save()
+
+    def get(self, ids: list[str] = None, limit: int = None, include: list[str] = None) -> dict:
+        with self._lock:
+            if ids is None:
+                positions = list(range(len(self.ids)))[:limit]
+            else:
+                positions = [self._positions[course_id] for course_id in ids if course_id in self._positions]
+            return {
+                'ids': [self.ids[p] for p in positions],
+                'documents': [self.documents[p] for p in positions],
+                'metadatas': [self._metadata_at(p) for p in positions]
+            }
+
+    def peek(self, limit: int = 10) -> dict:
+        return self.get(limit=limit)
+
+    _COMPARISONS = {
+        '$eq': np.equal, '$ne': np.not_equal,
+        '$lt': np.less, '$lte': np.less_equal,
+        '$gt': np.greater, '$gte': np.greater_equal,
+    }
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        """Evaluate a Chroma-style metadata where clause over all rows at once"""
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == '$and':
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+                continue
+            if key == '$or':
+                either = np.zeros(len(self.ids), dtype=bool)
+                for clause in condition:
+                    either |= self._where_mask(clause)
+                mask &= either
+                continue
+
+            if key == 'course_id':
+                column = np.asarray(self.ids, dtype=object)
+            else:
+                column = np.asarray(self.columns.get(key, [None] * len(self.ids)), dtype=object)
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            for operator, value in condition.items():
+                if operator == '$in':
+                    mask &= np.isin(column, list(value))
+                elif operator == '$nin':
+                    mask &= ~np.isin(column, list(value))
+                elif operator in self._COMPARISONS:
+                    present = column != None  # noqa: E711 - elementwise comparison
+                    matched = np.zeros(len(self.ids), dtype=bool)
+                    if present.any():
+                        matched[present] = self._COMPARISONS[operator](column[present], value).astype(bool)
+                    mask &= matched
+                else:
+                    raise ValueError(f"Unsupported where operator {operator}")
+        return mask
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine scores of every row for each query, as float32"""
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_CHUNK_ROWS):
+            chunk = np.asarray(self.vectors[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(chunk)] = queries @ chunk.T
+        return scores
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None) -> dict:
+        """Exact top-k cosine search for one or more query vectors.
+
+        ``where`` filters rows by metadata before ranking. Returns ``ids``,
+        ``metadatas``, ``documents`` and cosine ``distances``, each as one list
+        per query, like ``chromadb.Collection.query``.
+        """
+        with self._lock:
+            self._fold()
+            queries = self._normalize(query_embeddings)
+            results = {'ids': [], 'metadatas': [], 'documents': [], 'distances': []}
+            allowed = self._where_mask(where) if where else None
+            total = len(self.ids) if allowed is None else int(allowed.sum())
+            k = min(n_results, total)
+            if k <= 0:
+                for key in results:
+                    results[key] = [[] for _ in range(len(queries))]
+                return results
+
+            scores = self._scores(queries)
+            if allowed is not None:
+                scores[:, ~allowed] = -np.inf
+            if k < len(self.ids):
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(len(self.ids)), (len(queries), 1))
+            for row, candidates in enumerate(top):
+                order = candidates[np.argsort(-scores[row, candidates], kind='stable')]
+                results['ids'].append([self.ids[p] for p in order])
+                results['metadatas'].append([self._metadata_at(p) for p in order])
+                results['documents'].append([self.documents[p] for p in order])
+                results['distances'].append([float(1 - scores[row, p]) for p in order])
+            return results
+
+
+if __name__ == "__main__":
+    # Explicit dtype migration: python -m services.numpy_index <persist_path> <collection_name> <dtype>
+    if len(sys.argv) != 4:
+        sys.exit("usage: python -m services.numpy_index <persist_path> <collection_name> <dtype>")
+    NumpyVectorIndex.convert(*sys.argv[1:])
@@ -1,31 +1,240 @@
+import asyncio
 import json
+import threading
+import time
+import weakref
+from collections import deque
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from services.llm_cache import LLMResponseCache
+from utils.config import get_setting
+from utils.fork import register_after_fork
 from utils.logger import logger
 
 
+def default_llm_cache():
+    """Build the response cache configured through the environment, if enabled"""
+    if not get_setting("LLM_CACHE_ENABLED", True, cast=bool):
+        return None
+    return LLMResponseCache(
+        db_path=get_setting("LLM_CACHE_PATH", "llm_cache.db"),
+        max_entries=get_setting("LLM_CACHE_MAX_ENTRIES", 5000, cast=int),
+        ttl_seconds=get_setting("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600, cast=int)
+    )
+
+
+class RequestMetrics:
+    """Thread-safe in-flight count, totals and a rolling latency window for HTTP calls"""
+
+    def __init__(self, window: int = 500):
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def finish(self, elapsed: float, failed: bool = False):
+        with self._lock:
+            self.in_flight -= 1
+            self.latencies.append(elapsed)
+            if failed:
+                self.errors += 1
+
+    def first_token(self, elapsed: float):
+        with self._lock:
+            self.first_token_latencies.append(elapsed)
+
+    @staticmethod
+    def _percentile(values: list, p: float) -> float:
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            first_tokens = sorted(self.first_token_latencies)
+            in_flight, requests_made, errors = self.in_flight, self.requests, self.errors
+
+        return {
+            'in_flight': in_flight,
+            'requests': requests_made,
+            'errors': errors,
+            'latency_p50': self._percentile(latencies, 0.50),
+            'latency_p95': self._percentile(latencies, 0.95),
+            'latency_max': latencies[-1] if latencies else 0.0,
+            'first_token_p50': self._percentile(first_tokens, 0.50),
+            'first_token_p95': self._percentile(first_tokens, 0.95)
+        }
+
+
 class OllamaClient:
     """Handles communication with Ollama LLM"""
 
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "tinyllama"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "tinyllama",
+                 cache: LLMResponseCache = None, connect_timeout: float = None,
+                 read_timeout: float = None, max_retries: int = None, max_concurrency: int = None):
         self.base_url = base_url
         self.model = model
+        self.cache = cache if cache is not None else default_llm_cache()
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else get_setting("OLLAMA_CONNECT_TIMEOUT", 3.0, cast=float),
+            read_timeout if read_timeout is not None else get_setting("OLLAMA_READ_TIMEOUT", 120.0, cast=float)
+        )
+        self.max_concurrency = max_concurrency or get_setting("OLLAMA_MAX_CONCURRENCY", 4, cast=int)
+        self.max_retries = max_retries if max_retries is not None else get_setting("OLLAMA_MAX_RETRIES", 2, cast=int)
+        self._connect()
+        self._async_slots = weakref.WeakKeyDictionary()
+        self.metrics = RequestMetrics()
+        # Pooled sockets must not be shared between pre-forked worker processes
+        register_after_fork(self._connect)
 
-    def generate_response(self, prompt: str) -> str:
-        """Generate response from Ollama"""
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False
-                }
+    def _connect(self):
+        # One keep-alive connection pool for every call made through this client
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.max_concurrency,
+            # Only retry when Ollama never got the request or reported itself unavailable;
+            # a read timeout means it is already busy generating, and retrying adds load
+            max_retries=Retry(
+                total=self.max_retries,
+                connect=self.max_retries,
+                read=0,
+                other=0,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset(["POST"]),
+                raise_on_status=False
             )
-            response.raise_for_status()
-            return response.json()["response"]
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Caps concurrent calls so a slow Ollama can't tie up threads without limit
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def _post_generate(self, prompt: str) -> dict:
+        """POST a non-streaming generation request through the pooled session"""
+        with self._slots:
+            self.metrics.start()
+            started = time.perf_counter()
+            failed = True
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/api/generate",
+                    json={
+                        "model": self.model,
+                        "prompt": prompt,
+                        "stream": False
+                    },
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+                data = response.json()
+                failed = False
+                return data
+            finally:
+                self.metrics.finish(time.perf_counter() - started, failed)
+
+    def _stream_generate(self, prompt: str):
+        """POST a streaming generation request and yield response fragments as they arrive"""
+        with self._slots:
+            self.metrics.start()
+            started = time.perf_counter()
+            failed = True
+            first = True
+            try:
+                with self.session.post(
+                    f"{self.base_url}/api/generate",
+                    json={
+                        "model": self.model,
+                        "prompt": prompt,
+                        "stream": True
+                    },
+                    timeout=self.timeout,
+                    stream=True
+                ) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise RuntimeError(chunk["error"])
+                        token = chunk.get("response", "")
+                        if token:
+                            if first:
+                                self.metrics.first_token(time.perf_counter() - started)
+                                first = False
+                            yield token
+                        if chunk.get("done"):
+                            break
+                failed = False
+            finally:
+                self.metrics.finish(time.perf_counter() - started, failed)
+
+    def stream_response(self, prompt: str, use_cache: bool = True, raise_on_error: bool = False):
+        """Yield the response to a prompt token by token.
+
+        Cached responses are yielded in one piece. A completed stream is
+        written to the cache; if Ollama fails before anything was yielded the
+        usual apology text is yielded instead, or the error is raised with
+        ``raise_on_error``.
+        """
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            cached = self.cache.get(self.model, prompt)
+            if cached is not None:
+                yield cached
+                return
+        parts = []
+        try:
+            for token in self._stream_generate(prompt):
+                parts.append(token)
+                yield token
+        except Exception as e:
+            logger.error(f"Error streaming from Ollama: {e}")
+            if raise_on_error:
+                raise
+            if not parts:
+                yield "Sorry, I couldn't generate a response at this time."
+            return
+        if use_cache and parts:
+            self.cache.set(self.model, prompt, "".join(parts))
+
+    def get_metrics(self) -> dict:
+        """In-flight requests, totals and latency percentiles (seconds)"""
+        return self.metrics.snapshot()
+
+    def generate_response(self, prompt: str, use_cache: bool = True, raise_on_error: bool = False) -> str:
+        """Generate response from Ollama, served from the response cache when possible.
+
+        Failures return an apology text, or raise with ``raise_on_error`` so
+        callers that store results can tell them apart from real answers.
+        """
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            cached = self.cache.get(self.model, prompt)
+            if cached is not None:
+                return cached
+        try:
+            text = self._post_generate(prompt)["response"]
         except Exception as e:
             logger.error(f"Error calling Ollama: {e}")
+            if raise_on_error:
+                raise
             return "Sorry, I couldn't generate a response at this time."
+        if use_cache:
+            self.cache.set(self.model, prompt, text)
+        return text
 
     def extract_preferences(self, user_feedback: str) -> dict:
         """Extract learning preferences from user feedback using LLM"""
@@ -64,32 +273,29 @@ Return ONLY a JSON object in this format:
             "budget_preference": "medium",
             "goals": ["skill development"]
         }
+    @staticmethod
+    def wrap_wp_prompt(prompt: str) -> str:
+        """Add a wrapper prompt to steer the model's response back to learning"""
+        return (
+            f"The user asked: \"{prompt}\"\n\n"
+            "As an AI learning assistant, your job is to always respond with something helpful, "
+            "but gently tie it back to education, learning paths, or skill-building courses where appropriate.\n"
+            "If the user's query is not directly course-related, give a brief answer and then relate it "
+            "to how learning something relevant can help them.\n\n"
+            "Your response:"
+        )
+
+    def stream_wp_response(self, prompt: str):
+        """Streaming variant of generate_wp_response"""
+        yield from self.stream_response(self.wrap_wp_prompt(prompt), use_cache=False)
+
     def generate_wp_response(self, prompt: str) -> str:
         """
         Generate a response using the Ollama API, ensuring that the reply stays within 
         the context of courses, learning, or skill development—even when unrelated questions are asked.
         """
         try:
-            # Add a wrapper prompt to steer the model's response
-            wrapped_prompt = (
-                f"The user asked: \"{prompt}\"\n\n"
-                "As an AI learning assistant, your job is to always respond with something helpful, "
-                "but gently tie it back to education, learning paths, or skill-building courses where appropriate.\n"
-                "If the user's query is not directly course-related, give a brief answer and then relate it "
-                "to how learning something relevant can help them.\n\n"
-                "Your response:"
-            )
-
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": wrapped_prompt,
-                    "stream": False
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = self._post_generate(self.wrap_wp_prompt(prompt))
             return data.get("response", "Sorry, no response generated.")
         
         except requests.RequestException as e:
@@ -99,4 +305,35 @@ Return ONLY a JSON object in this format:
             logger.error(f"Unexpected error in generate_wp_response: {e}")
             return "Sorry, something went wrong generating the response."
 
-            
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_slots.get(loop)
+        if semaphore is None:
+            semaphore = self._async_slots.setdefault(loop, asyncio.Semaphore(self.max_concurrency))
+        return semaphore
+
+    async def agenerate_response(self, prompt: str, use_cache: bool = True) -> str:
+        """Async variant of generate_response; at most max_concurrency calls run at once per event loop"""
+        async with self._async_semaphore():
+            return await asyncio.to_thread(self.generate_response, prompt, use_cache)
+
+    async def agenerate_many(self, prompts: list[str], use_cache: bool = True) -> list[str]:
+        """Generate responses for several prompts concurrently, preserving order"""
+        return list(await asyncio.gather(*(self.agenerate_response(prompt, use_cache) for prompt in prompts)))
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_ollama_client() -> OllamaClient:
+    """Process-wide OllamaClient so every caller shares one connection pool and cache"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = OllamaClient(
+                    base_url=get_setting("OLLAMA_BASE_URL", "http://localhost:11434"),
+                    model=get_setting("OLLAMA_MODEL", "tinyllama")
+                )
+    return _shared_client
@@ -0,0 +1,149 @@
+import json
+import os
+import sys
+import numpy as np
+from utils.logger import logger
+
+CONFIG_FILE = "encoder_config.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+
+class OnnxEncoder:
+    """Sentence encoder that runs an exported transformer with ONNX Runtime.
+
+    Reproduces the SentenceTransformer pipeline used for MiniLM (tokenize,
+    transformer, mean pooling over the attention mask, L2 normalization)
+    using only ``onnxruntime`` and ``tokenizers``, so neither torch nor
+    sentence_transformers is imported. The model directory is produced by
+    ``export_onnx`` and holds the ``.onnx`` graph, ``tokenizer.json`` and
+    ``encoder_config.json``.
+    """
+
+    def __init__(self, model_dir: str, model_file: str = MODEL_FILE, num_threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_length"])
+        self.tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.pad_id = self.config.get("pad_token_id", 0)
+        logger.info(f"Loaded ONNX encoder {os.path.join(model_dir, model_file)}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        length = max(len(e.ids) for e in encodings)
+        input_ids = np.full((len(texts), length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(texts), length), dtype=np.int64)
+        token_type_ids = np.zeros((len(texts), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            n = len(encoding.ids)
+            input_ids[row, :n] = encoding.ids
+            attention_mask[row, :n] = 1
+            token_type_ids[row, :n] = encoding.type_ids
+
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask, 'token_type_ids': token_type_ids}
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config.get("normalize", True):
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled = pooled / np.clip(norms, 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Embed one text or a list of texts, like ``SentenceTransformer.encode``"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Batch texts of similar length together to keep padding small
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        embeddings = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            positions = order[start:start + batch_size]
+            embeddings[positions] = self._encode_batch([texts[p] for p in positions])
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = False, opset: int = 17) -> str:
+    """Export a SentenceTransformer model to ``output_dir`` for ``OnnxEncoder``.
+
+    This is an offline step that needs torch, sentence_transformers and the
+    ``onnx`` package; serving only needs onnxruntime. With ``quantize`` an
+    int8 dynamically-quantized copy is written next to the float32 graph.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0]
+    pooling = model[1]
+    # sentence_transformers renamed the flag to a ``pooling_mode`` string in later releases
+    mean_pooling = getattr(pooling, "pooling_mode_mean_tokens", False) or getattr(pooling, "pooling_mode", None) == "mean"
+    if not mean_pooling:
+        raise ValueError(f"{model_name} does not use mean pooling, which OnnxEncoder implements")
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.auto_model(input_ids=input_ids, attention_mask=attention_mask,
+                                   token_type_ids=token_type_ids).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Trace with a padded batch so the attention-mask path ends up in the graph
+    sample = transformer.tokenizer(["export", "export a padded sample batch"], padding=True, return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    torch.onnx.export(
+        LastHiddenState(transformer.auto_model).eval(),
+        tuple(sample[name] for name in names),
+        model_path,
+        dynamo=False,
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+        opset_version=opset
+    )
+    transformer.tokenizer.backend_tokenizer.save(os.path.join(output_dir, "tokenizer.json"))
+    with open(os.path.join(output_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "source_model": model_name,
+            "max_length": transformer.max_seq_length,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "pad_token_id": transformer.tokenizer.pad_token_id or 0,
+            "normalize": any(type(module).__name__ == "Normalize" for module in model)
+        }, f, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(model_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+    logger.info(f"Exported {model_name} to {output_dir}")
+    return output_dir
+
+
+if __name__ == "__main__":
+    # python -m services.onnx_encoder <output_dir> [--quantize] [model_name]
+    args = [arg for arg in sys.argv[1:] if arg != "--quantize"]
+    if not args:
+        sys.exit("usage: python -m services.onnx_encoder <output_dir> [--quantize] [model_name]")
+    from services.encoder import DEFAULT_MODEL_NAME
+    export_onnx(args[1] if len(args) > 1 else DEFAULT_MODEL_NAME, args[0], quantize="--quantize" in sys.argv)
@@ -0,0 +1,176 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+import numpy as np
+from utils.logger import logger
+
+
+class QueryEmbeddingCache:
+    """LRU cache of query embeddings with an optional SQLite layer on disk.
+
+    Entries are keyed by model name plus the whitespace-normalized query
+    text. At most ``max_entries`` vectors are kept in memory; with a
+    ``db_path`` every new embedding is also written to disk (bounded by
+    ``max_disk_entries``) so repeated queries survive restarts and are shared
+    between worker processes.
+    """
+
+    def __init__(self, model: str, max_entries: int = 2048, db_path: Optional[str] = None,
+                 max_disk_entries: int = 50000):
+        self.model = model
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        if db_path:
+            self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def init_database(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                vector BLOB,
+                last_accessed REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_accessed ON query_embeddings (last_accessed)")
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Collapse whitespace so template indentation doesn't split cache entries"""
+        return re.sub(r"\s+", " ", text).strip()
+
+    def make_key(self, text: str) -> str:
+        text_hash = hashlib.sha256(self.normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.model}:{text_hash}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load_from_disk(self, keys: list[str]) -> dict:
+        if not self.db_path or not keys:
+            return {}
+        conn = self._connect()
+        try:
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT cache_key, vector FROM query_embeddings WHERE cache_key IN ({placeholders})", keys
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE query_embeddings SET last_accessed = ? WHERE cache_key = ?",
+                    [(time.time(), row[0]) for row in rows]
+                )
+                conn.commit()
+            return {row[0]: np.frombuffer(row[1], dtype=np.float32) for row in rows}
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding cache read failed: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def _save_to_disk(self, entries: dict):
+        if not self.db_path or not entries:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.executemany("""
+                INSERT OR REPLACE INTO query_embeddings (cache_key, model, vector, last_accessed)
+                VALUES (?, ?, ?, ?)
+            """, [(key, self.model, vector.astype(np.float32).tobytes(), now) for key, vector in entries.items()])
+            conn.execute("""
+                DELETE FROM query_embeddings WHERE cache_key IN (
+                    SELECT cache_key FROM query_embeddings
+                    ORDER BY last_accessed DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (self.max_disk_entries,))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Query embedding cache write failed: {e}")
+        finally:
+            conn.close()
+
+    def encode(self, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """Return one embedding per text, calling ``encode`` only for texts not cached.
+
+        Misses are encoded together in a single call and duplicates within
+        ``texts`` are encoded once.
+        """
+        keys = [self.make_key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+            memory_hits = sum(1 for key in keys if key in found)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        from_disk = self._load_from_disk(missing)
+        for key, vector in from_disk.items():
+            self._remember(key, vector)
+        found.update(from_disk)
+
+        to_encode = [key for key in missing if key not in found]
+        if to_encode:
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            vectors = np.asarray(encode([first_text[key] for key in to_encode]), dtype=np.float32)
+            encoded = dict(zip(to_encode, vectors))
+            for key, vector in encoded.items():
+                self._remember(key, vector)
+            self._save_to_disk(encoded)
+            found.update(encoded)
+
+        with self._lock:
+            self.hits += memory_hits
+            self.disk_hits += sum(1 for key in keys if key in from_disk)
+            self.misses += sum(1 for key in keys if key in to_encode)
+        return np.stack([found[key] for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+        if self.db_path:
+            conn = self._connect()
+            conn.execute("DELETE FROM query_embeddings")
+            conn.commit()
+            conn.close()
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process and the memory held by cached vectors"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'memory_bytes': sum(vector.nbytes for vector in self._entries.values())
+            }
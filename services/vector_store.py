@@ -1,18 +1,163 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
+import json
+import os
+from typing import Iterable
 from models.course import Course
+from models.search_constraints import SearchConstraints
+from services.catalog_manifest import CatalogManifest, content_hash
+from services.embedding_pipeline import EmbeddingPipeline
+from services.encoder import get_encoder, encoder_id, DEFAULT_MODEL_NAME
+from services.numpy_index import NumpyVectorIndex, DTYPES
+from services.query_embedding_cache import QueryEmbeddingCache
+from utils.config import get_setting
 from utils.logger import logger
+
+BACKENDS = ("chroma", "numpy")
+# Chroma's own HNSW defaults; M is the graph degree, the ef values are candidate list sizes
+HNSW_DEFAULTS = {'M': 16, 'construction_ef': 100, 'search_ef': 100}
+
+
+def default_query_cache(model_name: str):
+    """Build the query embedding cache configured through the environment, if enabled"""
+    if not get_setting("QUERY_CACHE_ENABLED", True, cast=bool):
+        return None
+    return QueryEmbeddingCache(
+        model=model_name,
+        max_entries=get_setting("QUERY_CACHE_MAX_ENTRIES", 2048, cast=int),
+        # Empty path keeps the cache in memory only
+        db_path=get_setting("QUERY_CACHE_PATH", "") or None,
+        max_disk_entries=get_setting("QUERY_CACHE_MAX_DISK_ENTRIES", 50000, cast=int)
+    )
+
+
+def hnsw_settings() -> dict:
+    """HNSW build (``M``, ``construction_ef``) and search (``search_ef``) parameters from the environment"""
+    return {
+        'M': get_setting("VECTOR_HNSW_M", HNSW_DEFAULTS['M'], cast=int),
+        'construction_ef': get_setting("VECTOR_HNSW_EF_CONSTRUCTION", HNSW_DEFAULTS['construction_ef'], cast=int),
+        'search_ef': get_setting("VECTOR_HNSW_EF_SEARCH", HNSW_DEFAULTS['search_ef'], cast=int)
+    }
+
+
+def built_hnsw(collection) -> dict:
+    """HNSW parameters an existing Chroma collection was actually created with"""
+    config = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+    metadata = collection.metadata or {}
+    return {
+        'M': config.get('max_neighbors', metadata.get('hnsw:M', HNSW_DEFAULTS['M'])),
+        'construction_ef': config.get('ef_construction', metadata.get('hnsw:construction_ef',
+                                                                      HNSW_DEFAULTS['construction_ef'])),
+        'search_ef': config.get('ef_search', metadata.get('hnsw:search_ef', HNSW_DEFAULTS['search_ef']))
+    }
+
+
+def set_search_ef(collection, search_ef: int) -> bool:
+    """Change ``search_ef`` of an existing Chroma collection.
+
+    Chroma applies the new value when the index is next loaded, so call
+    this before the first query. Returns False if the installed Chroma
+    can't change it.
+    """
+    if built_hnsw(collection)['search_ef'] == search_ef:
+        return True
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    except Exception as e:
+        logger.warning(f"Could not set HNSW search_ef={search_ef} on collection {collection.name}: {e}")
+        return False
+    return True
+
+
+def open_chroma_collection(client, name: str, hnsw: dict):
+    """Get or create a cosine Chroma collection with the given HNSW parameters.
+
+    ``M`` and ``construction_ef`` are fixed once the graph is built, so an
+    existing collection keeps its own until it is rebuilt (delete the
+    persist directory and sync again); ``search_ef`` can change any time.
+    """
+    collection = client.get_or_create_collection(
+        name=name,
+        metadata={
+            "hnsw:space": "cosine",
+            "hnsw:M": hnsw['M'],
+            "hnsw:construction_ef": hnsw['construction_ef'],
+            "hnsw:search_ef": hnsw['search_ef']
+        },
+        # Embeddings are always computed with VectorStore.encoder, so Chroma
+        # must not load its own default embedding model for queries.
+        embedding_function=None
+    )
+    built = built_hnsw(collection)
+    if (built['M'], built['construction_ef']) != (hnsw['M'], hnsw['construction_ef']):
+        logger.warning(f"Collection {name} was built with HNSW M={built['M']}, "
+                       f"construction_ef={built['construction_ef']}; rebuild it to use "
+                       f"M={hnsw['M']}, construction_ef={hnsw['construction_ef']}")
+    set_search_ef(collection, hnsw['search_ef'])
+    return collection
+
+
 class VectorStore:
     """Handles vector embeddings and similarity search"""
     
-    def __init__(self, collection_name: str = "courses"):
-        self.client = chromadb.PersistentClient(path="./chroma_db")
+    def __init__(self, collection_name: str = "courses", persist_path: str = "./chroma_db",
+                 backend: str = None, hnsw: dict = None, vector_dtype: str = None):
+        self.backend = backend or get_setting("VECTOR_BACKEND", "chroma")
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown vector backend '{self.backend}', expected one of {BACKENDS}")
         self.collection_name = collection_name
-        self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
+        self.model_name = DEFAULT_MODEL_NAME
+        self.encoder_id = encoder_id(self.model_name)
+        # The encoder is loaded on first use: a restart with an unchanged
+        # catalog and cached queries may never need it
+        self.pipeline = EmbeddingPipeline(model_name=self.model_name)
+        self.query_cache = default_query_cache(self.encoder_id)
+        # Overrides for hnsw_settings(); only used by the Chroma backend
+        self.hnsw = {**hnsw_settings(), **(hnsw or {})}
+        # Reduced-precision storage is a numpy backend option; Chroma always stores float32
+        self.vector_dtype = vector_dtype or get_setting("VECTOR_DTYPE", "float32")
+        if self.vector_dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype '{self.vector_dtype}', expected one of {DTYPES}")
+        if self.backend == "numpy":
+            # Exact brute-force search; exposes the same collection methods as Chroma
+            self.client = None
+            self.collection = NumpyVectorIndex(persist_path, collection_name, dtype=self.vector_dtype)
+        else:
+            import chromadb
+            self.client = chromadb.PersistentClient(path=persist_path)
+            self.collection = open_chroma_collection(self.client, collection_name, self.hnsw)
+        self.manifest = CatalogManifest(
+            os.path.join(persist_path, f"{collection_name}_{self.backend}_manifest.json")
         )
+
+    @property
+    def encoder(self):
+        return get_encoder(self.model_name)
+
+    @staticmethod
+    def course_document(course: Course) -> str:
+        """Rich text representation of a course used for embedding"""
+        doc_text = f"""
+            Title: {course.title}
+            Description: {course.description}
+            Category: {course.category}
+            Difficulty: {course.difficulty}
+            Tags: {', '.join(course.tags)}
+            Duration: {course.duration} hours
+            """
+        return doc_text.strip()
+
+    @staticmethod
+    def course_metadata(course: Course) -> dict:
+        return {
+            'course_id': course.id,
+            'title': course.title,
+            'category': course.category,
+            'difficulty': course.difficulty,
+            'duration': course.duration,
+            'rating': course.rating,
+            'price': course.price,
+            'tags': ','.join(course.tags),
+            'students_enrolled': course.students_enrolled
+        }
     
     def add_courses(self, courses: list[Course]):
         """Add course embeddings to vector store"""
@@ -21,60 +166,205 @@ class VectorStore:
         ids = []
         
         for course in courses:
-            # Create rich text representation for embedding
-            doc_text = f"""
-            Title: {course.title}
-            Description: {course.description}
-            Category: {course.category}
-            Difficulty: {course.difficulty}
-            Tags: {', '.join(course.tags)}
-            Duration: {course.duration} hours
-            """
-            
-            documents.append(doc_text.strip())
-            metadatas.append({
-                'title': course.title,
-                'category': course.category,
-                'difficulty': course.difficulty,
-                'duration': course.duration,
-                'rating': course.rating,
-                'price': course.price,
-                'tags': ','.join(course.tags)
-            })
+            documents.append(self.course_document(course))
+            metadatas.append(self.course_metadata(course))
             ids.append(course.id)
         
-        # Generate embeddings
-        embeddings = self.encoder.encode(documents).tolist()
-        
-        self.collection.add(
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # Generate embeddings batch by batch and write each batch as it is ready
+        for start, embeddings in self.pipeline.iter_batches(documents):
+            end = start + len(embeddings)
+            self.collection.add(
+                embeddings=embeddings.tolist(),
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
         logger.info(f"Added {len(courses)} courses to vector store")
+
+    def sync_courses(self, courses: list[Course]) -> dict:
+        """Incrementally bring the vector store in line with a course catalog.
+
+        Only new or changed documents are embedded and upserted, rows whose
+        metadata alone changed are updated in place, and courses missing from
+        the catalog are deleted. Returns counts of added, updated, skipped and
+        removed rows.
+        """
+        return self.sync_course_batches([courses])
+
+    def sync_course_batches(self, batches: Iterable[list[Course]]) -> dict:
+        """Like ``sync_courses``, for a catalog that arrives in batches.
+
+        Each batch is embedded and written as soon as it arrives and the
+        manifest is saved after every batch; deletions happen once the whole
+        catalog has been seen.
+        """
+        orphans = self._reconcile_manifest()
+        self.pipeline.reset_stats()
+
+        report = {'added': 0, 'updated': 0, 'skipped': 0, 'removed': 0}
+        seen_ids = set()
+        # The numpy index is rewritten once at the end rather than after every batch
+        bulk = isinstance(self.collection, NumpyVectorIndex)
+        if bulk:
+            self.collection.begin_bulk()
+        try:
+            for courses in batches:
+                changes = self._sync_batch(courses)
+                seen_ids.update(course.id for course in courses)
+                report['added'] += len(changes['added'])
+                report['updated'] += len(changes['updated']) + len(changes['metadata_only'])
+                report['skipped'] += len(changes['skipped'])
+        finally:
+            self.pipeline.close()
+            if bulk:
+                self.collection.end_bulk()
+            self.manifest.save()
+
+        removed = self.manifest.missing(seen_ids)
+        stale = [course_id for course_id in orphans if course_id not in seen_ids]
+        if removed or stale:
+            self.collection.delete(ids=removed + stale)
+            for course_id in removed:
+                self.manifest.entries.pop(course_id, None)
+            self.manifest.save()
+        report['removed'] = len(removed) + len(stale)
+
+        logger.info(f"Synced courses to vector store: {report} "
+                    f"({self.pipeline.stats['docs_per_sec']:.1f} docs/sec embedded)")
+        return report
+
+    def _reconcile_manifest(self) -> set:
+        """Make the manifest agree with what the collection actually holds.
+
+        Entries for rows the collection lost are dropped so they get
+        re-embedded. Returns IDs present in the collection but unknown to the
+        manifest (e.g. written just before an interrupted ingest could
+        checkpoint); they are re-embedded if still in the catalog and deleted
+        otherwise.
+        """
+        if len(self.manifest.entries) == self.collection.count():
+            return set()
+        stored_ids = set(self.collection.get(include=[])['ids'])
+        dropped = [course_id for course_id in self.manifest.entries if course_id not in stored_ids]
+        for course_id in dropped:
+            del self.manifest.entries[course_id]
+        orphans = stored_ids - set(self.manifest.entries)
+        logger.info(f"Catalog manifest out of sync with collection: {len(dropped)} entries dropped, "
+                    f"{len(orphans)} untracked rows found")
+        return orphans
+
+    def text_fingerprint(self, document: str) -> str:
+        # Vectors from another encoder aren't comparable with stored ones, so
+        # switching encoders changes every fingerprint and re-embeds the catalog
+        if self.encoder_id == self.model_name:
+            return content_hash(document)
+        return content_hash(f"{self.encoder_id}\n{document}")
+
+    def _sync_batch(self, courses: list[Course]) -> dict:
+        by_id = {}
+        fingerprints = {}
+        for course in courses:
+            document = self.course_document(course)
+            metadata = self.course_metadata(course)
+            by_id[course.id] = (document, metadata)
+            fingerprints[course.id] = {
+                'text': self.text_fingerprint(document),
+                'meta': content_hash(json.dumps(metadata, sort_keys=True))
+            }
+
+        changes = self.manifest.diff(fingerprints)
+
+        to_embed = changes['added'] + changes['updated']
+        documents = [by_id[course_id][0] for course_id in to_embed]
+        for start, embeddings in self.pipeline.iter_batches(documents):
+            batch_ids = to_embed[start:start + len(embeddings)]
+            self.collection.upsert(
+                embeddings=embeddings.tolist(),
+                documents=documents[start:start + len(embeddings)],
+                metadatas=[by_id[course_id][1] for course_id in batch_ids],
+                ids=batch_ids
+            )
+            # Checkpoint after every batch so an interrupted ingest resumes here
+            self.manifest.checkpoint({course_id: fingerprints[course_id] for course_id in batch_ids})
+
+        if changes['metadata_only']:
+            self.collection.update(
+                ids=changes['metadata_only'],
+                metadatas=[by_id[course_id][1] for course_id in changes['metadata_only']]
+            )
+            self.manifest.checkpoint({course_id: fingerprints[course_id] for course_id in changes['metadata_only']})
+        return changes
     
-    def search_similar_courses(self, query: str, user_preferences: dict, 
-                             n_results: int = 10) -> list[dict]:
-        """Search for similar courses based on query and user preferences"""
-        
-        # Enhance query with user preferences
-        enhanced_query = f"""
+    @staticmethod
+    def build_query_text(query: str, user_preferences: dict) -> str:
+        """Enhance a search query with user preferences"""
+        return f"""
         {query}
         Preferred categories: {', '.join(user_preferences.get('preferred_categories', []))}
         Preferred difficulty: {user_preferences.get('preferred_difficulty', 'any')}
         Learning style: {user_preferences.get('learning_style', 'any')}
         """
-        
-        results = self.collection.query(
-            query_texts=[enhanced_query],
-            n_results=n_results
-        )
-        
+
+    def encode_queries(self, query_texts: list[str]) -> list[list[float]]:
+        """Embed query texts with the ingestion encoder, reusing cached vectors for
+        repeated texts; the rest are encoded in a single forward pass"""
+        if self.query_cache is None:
+            return self.encoder.encode(query_texts).tolist()
+        return self.query_cache.encode(query_texts, self.encoder.encode).tolist()
+
+    def search_similar_courses(self, query: str, user_preferences: dict, 
+                             n_results: int = 10, constraints: SearchConstraints = None) -> list[dict]:
+        """Search for similar courses based on query and user preferences"""
+        return self.search_similar_courses_batch([query], [user_preferences], n_results, constraints)[0]
+
+    def search_similar_courses_batch(self, queries: list[str], preferences_list: list[dict],
+                                     n_results: int = 10, constraints: SearchConstraints = None) -> list[list[dict]]:
+        """Search for several queries at once.
+
+        All enhanced queries are encoded together and sent as one
+        ``query_embeddings`` call. ``constraints`` are pushed down into the
+        query as a metadata filter; if a query comes back full but still has
+        fewer than ``n_results`` matches after filtering, the fetch size is
+        doubled until it has enough, returns fewer rows than requested
+        (every match seen) or covers the whole collection.
+        Returns one result list per query, in order.
+        """
+        if len(queries) != len(preferences_list):
+            raise ValueError("queries and preferences_list must have the same length")
+        if not queries:
+            return []
+        if constraints is not None and constraints.excludes_everything():
+            return [[] for _ in queries]
+
+        query_texts = [self.build_query_text(query, prefs) for query, prefs in zip(queries, preferences_list)]
+        query_embeddings = self.encode_queries(query_texts)
+        where = constraints.to_where() if constraints is not None else None
+        total = self.collection.count()
+        if total == 0:
+            return [[] for _ in queries]
+
+        fetch = min(n_results, total)
+        while True:
+            kwargs = {'where': where} if where else {}
+            results = self.collection.query(query_embeddings=query_embeddings, n_results=fetch, **kwargs)
+            batch = [self._parse_query_results(results, i) for i in range(len(queries))]
+            if constraints is not None:
+                batch = [[c for c in courses if constraints.matches(c)] for courses in batch]
+            # The where filter is exact, so a query that got fewer rows than it
+            # asked for has already seen every match and can't gain from widening
+            short = [len(courses) < n_results and len(results['ids'][i]) >= fetch
+                     for i, courses in enumerate(batch)]
+            if fetch >= total or not any(short):
+                return [courses[:n_results] for courses in batch]
+            fetch = min(fetch * 2, total)
+            logger.info(f"Widening filtered vector search to {fetch} results")
+
+    @staticmethod
+    def _parse_query_results(results: dict, query_index: int) -> list[dict]:
         courses = []
-        for i, course_id in enumerate(results['ids'][0]):
-            metadata = results['metadatas'][0][i]
-            distance = results['distances'][0][i]
+        for i, course_id in enumerate(results['ids'][query_index]):
+            metadata = results['metadatas'][query_index][i]
+            distance = results['distances'][query_index][i]
             
             courses.append({
                 'course_id': course_id,
@@ -85,6 +375,7 @@ class VectorStore:
                 'rating': metadata['rating'],
                 'price': metadata['price'],
                 'tags': metadata['tags'].split(','),
+                'students_enrolled': metadata.get('students_enrolled', 0),
                 'similarity_score': 1 - distance  # Convert distance to similarity
             })
         
@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+from utils.logger import logger
+
+# Returned by VideoCache.get when nothing usable is cached
+MISS = object()
+
+
+class VideoCache:
+    """Disk-backed SQLite cache mapping course IDs to YouTube video IDs.
+
+    Found videos are kept for ``ttl_seconds``. Searches that found nothing
+    are cached as well, for the shorter ``negative_ttl_seconds``, so courses
+    without a video don't trigger a search on every page view. An entry is
+    only reused while the search query it was found with still matches.
+    """
+
+    def __init__(self, db_path: str = "video_cache.db", ttl_seconds: int = 7 * 24 * 3600,
+                 negative_ttl_seconds: int = 24 * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def init_database(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS course_videos (
+                course_id TEXT PRIMARY KEY,
+                query TEXT,
+                video_id TEXT,
+                fetched_at REAL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def get(self, course_id: str, query: str):
+        """Return the cached video ID (None when known to have no video), or MISS"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT query, video_id, fetched_at FROM course_videos WHERE course_id = ?", (course_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Video cache read failed: {e}")
+            row = None
+        finally:
+            conn.close()
+
+        if row and row[0] == query:
+            ttl = self.ttl_seconds if row[1] is not None else self.negative_ttl_seconds
+            if time.time() - row[2] <= ttl:
+                with self._lock:
+                    self.hits += 1
+                return row[1]
+        with self._lock:
+            self.misses += 1
+        return MISS
+
+    def set(self, course_id: str, query: str, video_id: Optional[str]):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO course_videos (course_id, query, video_id, fetched_at)
+                VALUES (?, ?, ?, ?)
+            """, (course_id, query, video_id, time.time()))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Video cache write failed: {e}")
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM course_videos")
+        conn.commit()
+        conn.close()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the number of stored entries"""
+        conn = self._connect()
+        entries, negative = conn.execute(
+            "SELECT COUNT(*), COUNT(*) - COUNT(video_id) FROM course_videos"
+        ).fetchone()
+        conn.close()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'negative_entries': negative
+            }
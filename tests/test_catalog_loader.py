@@ -0,0 +1,46 @@
+import os,sys
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from engine.catalog_loader import parse_enrollment, normalize_catalog_frame, frame_to_courses, iter_catalog_frames
+from models.course import Course
+
+# ✅ Test: Enrolment counts with k/m suffixes are parsed
+def test_parse_enrollment():
+    values = pd.Series(["5.3k", "17k", "1.2m", "3,400", "870", None, "lots"])
+    assert parse_enrollment(values).tolist() == [5300, 17000, 1200000, 3400, 870, 0, 0]
+
+# ✅ Test: Raw rows are normalized into Course fields
+def test_normalize_catalog_frame():
+    raw = pd.DataFrame({
+        "course_title": ["Intro to Python", "Deep Learning"],
+        "course_organization": ["Example University", None],
+        "course_Certificate_type": ["COURSE", None],
+        "course_rating": [4.7, None],
+        "course_difficulty": ["Beginner", None],
+        "course_students_enrolled": ["5.3k", "2m"],
+    })
+
+    courses = frame_to_courses(normalize_catalog_frame(raw, start_index=10))
+
+    assert courses[0] == Course(id="10", title="Intro to Python", description="Example University",
+                                category="COURSE", difficulty="beginner", duration=40, tags=["course"],
+                                rating=4.7, price=99.99, students_enrolled=5300)
+    assert courses[1].id == "11"
+    assert courses[1].description == "No description"
+    assert courses[1].category == "General"
+    assert courses[1].difficulty == "mixed"
+    assert courses[1].rating == 4.0
+    assert courses[1].students_enrolled == 2000000
+
+# ✅ Test: Chunked loading keeps IDs aligned with file rows
+def test_iter_catalog_frames_chunks(tmp_path):
+    csv_path = tmp_path / "catalog.csv"
+    pd.DataFrame({
+        "course_title": [f"Course {i}" for i in range(5)],
+        "course_students_enrolled": ["1k"] * 5,
+    }).to_csv(csv_path)
+
+    frames = list(iter_catalog_frames(str(csv_path), chunksize=2))
+
+    assert [len(frame) for frame in frames] == [2, 2, 1]
+    assert [course_id for frame in frames for course_id in frame["id"]] == ["0", "1", "2", "3", "4"]
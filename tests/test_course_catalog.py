@@ -0,0 +1,48 @@
+import os,sys
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from models.course import Course
+from models.course_catalog import CourseCatalog
+
+@pytest.fixture
+def catalog():
+    return CourseCatalog.from_courses([
+        Course(id="1", title="Intro to Python", description="Learn Python from scratch.", category="Programming",
+               difficulty="beginner", duration=5, tags=["python", "coding"], rating=4.5, price=0.0),
+        Course(id="2", title="Advanced Machine Learning", description="Deep dive into ML concepts.",
+               category="Data Science", difficulty="advanced", duration=10, tags=["ml"], rating=4.8, price=49.99),
+        Course(id="3", title="Python for Data", description="Pandas and NumPy.", category="Data Science",
+               difficulty="beginner", duration=8, tags=[], rating=4.1, price=19.99),
+    ])
+
+# ✅ Test: Lookups by ID rebuild the original course
+def test_get_by_id(catalog):
+    course = catalog.get("2")
+    assert course == Course(id="2", title="Advanced Machine Learning", description="Deep dive into ML concepts.",
+                            category="Data Science", difficulty="advanced", duration=10, tags=["ml"],
+                            rating=4.8, price=49.99)
+    assert catalog.get("99") is None
+    assert "3" in catalog and "99" not in catalog
+    assert len(catalog) == 3
+
+# ✅ Test: Category and difficulty lookups by ID
+def test_category_and_difficulty_lookup(catalog):
+    assert catalog.category_of("1") == "Programming"
+    assert catalog.difficulty_of("99") is None
+
+# ✅ Test: Most-enrolled courses honour exclusions
+def test_most_enrolled():
+    catalog = CourseCatalog.from_courses([
+        Course(id=str(i), title="t", description="d", category="c", difficulty="beginner", duration=1,
+               tags=[], rating=4.0, price=0.0, students_enrolled=enrolled)
+        for i, enrolled in enumerate([100, 500, 300], 1)
+    ])
+    assert [c.id for c in catalog.most_enrolled(2)] == ["2", "3"]
+    assert [c.id for c in catalog.most_enrolled(2, exclude=["2"])] == ["3", "1"]
+
+# ✅ Test: Duplicate IDs are rejected
+def test_duplicate_ids():
+    course = Course(id="1", title="t", description="d", category="c", difficulty="beginner",
+                    duration=1, tags=[], rating=4.0, price=0.0)
+    with pytest.raises(ValueError):
+        CourseCatalog.from_courses([course, course])
@@ -0,0 +1,111 @@
+import os,sys
+import threading
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from db.database_manager import DatabaseManager
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(db_path=str(tmp_path / "test.db"))
+    yield manager
+    manager.close()
+
+# ✅ Test: Connections run in WAL mode and are reused per thread
+def test_connection_is_wal_and_reused(db):
+    conn = db._connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db._connection() is conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db._connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+# ✅ Test: A failing transaction rolls back every step
+def test_transaction_rolls_back(db):
+    db.create_user("u1", "Ada", {"preferred_categories": []})
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_interaction("u1", "42", "feedback", 5, "great")
+            db.update_user_preferences("u1", {"preferred_categories": ["COURSE"]})
+            raise RuntimeError("boom")
+
+    assert db.get_user_interactions("u1") == []
+    assert db.get_user("u1")["preferences"] == {"preferred_categories": []}
+
+# ✅ Test: Duplicate users are rejected without breaking the connection
+def test_create_user_duplicate(db):
+    assert db.create_user("u1", "Ada", {}) is True
+    assert db.create_user("u1", "Ada", {}) is False
+    db.add_interaction("u1", "42", "view")
+    assert len(db.get_user_interactions("u1")) == 1
+
+# ✅ Test: Migrations add the interaction indexes once
+def test_migrations_create_indexes(db):
+    conn = db._connection()
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_interactions_user_time", "idx_interactions_user_type_time", "idx_interactions_user_course"} <= indexes
+
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    DatabaseManager(db_path=db.db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == version
+
+# ✅ Test: Targeted interaction accessors and keyset pagination
+def test_interaction_accessors(db):
+    db.create_user("u1", "Ada", {})
+    for i in range(5):
+        db.add_interaction("u1", "manual_query", "query", feedback=f"goal {i}")
+    db.add_interaction("u1", "42", "feedback", 5, "great")
+
+    assert db.latest_interaction("u1", "query")["feedback"] == "goal 4"
+    assert db.latest_interaction("u1", "view") is None
+    assert db.interacted_course_ids("u1") == {"manual_query", "42"}
+
+    first = db.get_interaction_history("u1", interaction_type="query", limit=3)
+    second = db.get_interaction_history("u1", interaction_type="query", limit=3, before=first["next_cursor"])
+
+    assert [i["feedback"] for i in first["interactions"]] == ["goal 4", "goal 3", "goal 2"]
+    assert [i["feedback"] for i in second["interactions"]] == ["goal 1", "goal 0"]
+    assert second["next_cursor"] is None
+
+# ✅ Test: Profile version moves only on changes that affect recommendations
+def test_profile_version(db):
+    db.create_user("u1", "Ada", {})
+    assert db.get_user("u1")["profile_version"] == 0
+
+    db.update_user_preferences("u1", {"preferred_categories": ["COURSE"]})
+    db.add_interaction("u1", "42", "view")
+    assert db.get_user("u1")["profile_version"] == 2
+
+    # Repeat interactions with a known course don't change the excluded set
+    db.add_interaction("u1", "42", "feedback", 5, "great")
+    assert db.get_user("u1")["profile_version"] == 2
+    assert db.get_recently_active_user_ids() == ["u1"]
+
+# ✅ Test: Onboarding sessions persist across managers and expire
+def test_onboarding_sessions(db):
+    db.save_onboarding_session("u1", 2, {"name": "Ada"})
+    other = DatabaseManager(db_path=db.db_path)
+    assert other.get_onboarding_session("u1") == {"step": 2, "data": {"name": "Ada"}}
+
+    assert db.get_onboarding_session("u1", ttl_seconds=-1) is None
+    assert db.get_onboarding_session("u1") is None
+
+    db.save_onboarding_session("u2", 1, {})
+    assert db.purge_expired_onboarding_sessions(ttl_seconds=-1) == 1
+    db.delete_onboarding_session("u3")
+
+# ✅ Test: A forked child opens its own connection
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_fork_gets_fresh_connection(db):
+    db.create_user("u1", "Ada", {})
+    parent_conn = db._connection()
+    pid = os.fork()
+    if pid == 0:
+        ok = db._connection() is not parent_conn and db.get_user("u1") is not None
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert db.get_user("u1")["name"] == "Ada"
@@ -0,0 +1,35 @@
+import os,sys
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.index_benchmark import benchmark, exact_neighbours, format_report, recall_at_k, synthetic_vectors
+
+# ✅ Test: recall@k counts the true neighbours that were found
+def test_recall_at_k():
+    assert recall_at_k([[1, 2, 3, 4]], [[4, 3, 2, 1]], 4) == 1.0
+    assert recall_at_k([[1, 2], [3, 4]], [[1, 9], [8, 9]], 2) == 0.25
+    assert recall_at_k([[1, 2, 3]], [[1, 2, 9]], 2) == 1.0
+
+# ✅ Test: Exact neighbours rank a vector's own row first
+def test_exact_neighbours():
+    vectors = synthetic_vectors(500, dim=16)
+    neighbours = exact_neighbours(vectors, vectors[:5], 3)
+    assert [row[0] for row in neighbours] == [0, 1, 2, 3, 4]
+    assert all(len(row) == 3 for row in neighbours)
+
+# ✅ Test: The report covers every index configuration
+def test_benchmark_report(tmp_path):
+    vectors = synthetic_vectors(2100, dim=32)
+    rows = benchmark(vectors[100:], vectors[:100], k=10, search_efs=(10, 100), workdir=str(tmp_path))
+
+    by_params = {row['params']: row for row in rows}
+    assert by_params['dtype=float32']['recall@10'] == 1.0
+    assert by_params['dtype=float16']['recall@10'] >= 0.95
+    assert by_params['dtype=float16']['size_mb'] < by_params['dtype=float32']['size_mb']
+    chroma = [row for row in rows if row['index'] == 'chroma']
+    assert [row['params'].split()[-1] for row in chroma] == ['search_ef=10', 'search_ef=100']
+    assert chroma[-1]['recall@10'] >= 0.9
+    assert all(row['mean_ms'] > 0 for row in rows)
+
+    report = format_report(rows)
+    assert len(report.splitlines()) == len(rows) + 1
+    assert "recall@10" in report.splitlines()[0]
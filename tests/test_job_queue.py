@@ -0,0 +1,73 @@
+import os,sys
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.job_queue import JobQueue, QUEUED, DUPLICATE, FULL
+
+# ✅ Test: Waiting jobs are de-duplicated per key and the queue applies backpressure
+def test_dedup_and_backpressure():
+    release = threading.Event()
+    started = threading.Event()
+    jobs = JobQueue(num_workers=1, max_depth=2, retry_backoff=0)
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    assert jobs.submit("busy", blocker) == QUEUED
+    started.wait(5)
+    assert jobs.submit("u1", lambda: None) == QUEUED
+    assert jobs.submit("u1", lambda: None) == DUPLICATE
+    assert jobs.submit("u2", lambda: None) == QUEUED
+    assert jobs.submit("u3", lambda: None) == FULL
+    assert jobs.stats()['depth'] == 2 and jobs.stats()['in_flight'] == 1
+
+    release.set()
+    jobs.join()
+    stats = jobs.stats()
+    assert stats['completed'] == 3 and stats['deduplicated'] == 1 and stats['rejected'] == 1
+    # Once a job has started its key can be queued again
+    assert jobs.submit("u1", lambda: None) == QUEUED
+    jobs.join()
+
+# ✅ Test: Failing jobs are retried, then counted as failed
+def test_retry():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RuntimeError("boom")
+
+    jobs = JobQueue(num_workers=1, max_retries=1, retry_backoff=0)
+    jobs.submit("u1", flaky)
+    jobs.submit("u2", lambda: 1 / 0)
+    jobs.join()
+
+    stats = jobs.stats()
+    assert len(attempts) == 2
+    assert stats['completed'] == 1 and stats['failed'] == 1 and stats['retried'] == 2
+
+# ✅ Test: A retry waits on a timer, not a worker, and jobs that already sent output aren't retried
+def test_retry_frees_worker_and_skips_sent_jobs():
+    jobs = JobQueue(num_workers=1, max_retries=1, retry_backoff=0.3)
+    order = []
+
+    def flaky():
+        order.append("flaky")
+        if order.count("flaky") == 1:
+            raise RuntimeError("boom")
+
+    def sent_then_failed():
+        order.append("sent")
+        jobs.mark_output()
+        raise RuntimeError("boom after sending")
+
+    jobs.submit("u1", flaky)
+    jobs.submit("u2", sent_then_failed)
+    jobs.submit("u3", lambda: order.append("other"))
+    jobs.join()
+
+    # u2 and u3 ran on the only worker while u1 waited out its backoff
+    assert order == ["flaky", "sent", "other", "flaky"]
+    stats = jobs.stats()
+    assert stats['completed'] == 2 and stats['failed'] == 1 and stats['retried'] == 1 and stats['scheduled'] == 0
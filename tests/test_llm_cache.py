@@ -0,0 +1,59 @@
+import os,sys
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.llm_cache import LLMResponseCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMResponseCache(db_path=str(tmp_path / "llm_cache.db"), max_entries=2, ttl_seconds=60)
+
+# ✅ Test: Hits ignore whitespace differences and are keyed by model
+def test_cache_hit_and_miss(cache):
+    assert cache.get("tinyllama", "Explain   this\n course") is None
+    cache.set("tinyllama", "Explain this course", "Because it fits.")
+
+    assert cache.get("tinyllama", "  Explain this\n\tcourse ") == "Because it fits."
+    assert cache.get("llama3", "Explain this course") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 1
+
+# ✅ Test: Least recently used entries are evicted past max_entries
+def test_cache_evicts_least_recently_used(cache):
+    cache.set("m", "a", "A")
+    cache.set("m", "b", "B")
+    assert cache.get("m", "a") == "A"
+    cache.set("m", "c", "C")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == "A"
+
+# ✅ Test: Expired entries are not served
+def test_cache_ttl(tmp_path):
+    cache = LLMResponseCache(db_path=str(tmp_path / "llm_cache.db"), ttl_seconds=-1)
+    cache.set("m", "a", "A")
+    assert cache.get("m", "a") is None
+
+# ✅ Test: Hits don't write to the database; access times are flushed in batches
+def test_cache_batches_access_times(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMResponseCache(db_path=path, touch_batch=2)
+
+    def hit_count(prompt):
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT hit_count FROM llm_responses WHERE cache_key = ?",
+                                (cache.make_key("m", prompt),)).fetchone()[0]
+
+    cache.set("m", "a", "A")
+    cache.set("m", "b", "B")
+    assert cache.get("m", "a") == "A"
+    assert cache.get("m", "a") == "A"
+    assert hit_count("a") == 0
+
+    assert cache.get("m", "b") == "B"  # second key touched fills the batch
+    assert (hit_count("a"), hit_count("b")) == (2, 1)
+    assert cache._connect().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
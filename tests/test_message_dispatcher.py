@@ -0,0 +1,97 @@
+import os,sys
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.message_dispatcher import MessageDispatcher, TokenBucket, split_message
+
+class FakeTransport:
+    """Records deliveries and fails the first ``failures`` attempts"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.sent = []
+        self.attempts = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, to, body):
+        with self.lock:
+            self.attempts += 1
+            if self.attempts <= self.failures:
+                raise ConnectionError("provider unavailable")
+            self.sent.append((to, body))
+
+# ✅ Test: Consecutive messages to one user are coalesced, in order
+def test_coalescing():
+    transport = FakeTransport()
+    dispatcher = MessageDispatcher(transport, rate_per_second=100, coalesce_window=0.2)
+    dispatcher.send("u1", "summary")
+    dispatcher.send("u2", "hello")
+    dispatcher.send("u1", "thanks")
+    assert dispatcher.flush(timeout=5)
+
+    assert sorted(transport.sent) == [("u1", "summary\n\nthanks"), ("u2", "hello")]
+    stats = dispatcher.stats()
+    assert stats['queued'] == 3 and stats['delivered'] == 2 and stats['coalesced'] == 1 and stats['depth'] == 0
+
+# ✅ Test: Failed deliveries are retried, then given up on; the returned future reports which
+def test_retry():
+    transport = FakeTransport(failures=1)
+    dispatcher = MessageDispatcher(transport, rate_per_second=100, retry_backoff=0, coalesce_window=0)
+    delivery = dispatcher.send("u1", "hi")
+    assert delivery.result(timeout=5) is True
+    assert dispatcher.flush(timeout=5)
+    assert transport.sent == [("u1", "hi")]
+    assert dispatcher.stats()['retried'] == 1
+
+    failing = MessageDispatcher(FakeTransport(failures=10), rate_per_second=100, max_retries=2,
+                                retry_backoff=0, coalesce_window=0)
+    delivery = failing.send("u1", "hi")
+    assert isinstance(delivery.exception(timeout=5), ConnectionError)
+    assert failing.flush(timeout=5)
+    assert failing.stats()['failed'] == 1
+
+# ✅ Test: A recipient waiting on a retry doesn't hold up other recipients
+def test_retry_does_not_block_other_recipients():
+    delivered = {}
+
+    def transport(to, body):
+        if to == "bad":
+            raise ConnectionError("rate limited")
+        delivered[to] = time.monotonic()
+
+    dispatcher = MessageDispatcher(transport, rate_per_second=100, max_retries=2,
+                                   retry_backoff=0.5, coalesce_window=0)
+    started = time.monotonic()
+    dispatcher.send("bad", "hi")
+    time.sleep(0.05)
+    dispatcher.send("good", "hello")
+    time.sleep(0.2)
+    assert delivered["good"] - started < 0.4
+    assert dispatcher.stats()['retrying'] == 1
+
+    assert dispatcher.flush(timeout=5)
+    assert dispatcher.stats()['failed'] == 1 and dispatcher.stats()['retried'] == 2
+
+# ✅ Test: Messages queued while a retry is pending go out after it
+def test_retry_keeps_order():
+    transport = FakeTransport(failures=1)
+    dispatcher = MessageDispatcher(transport, rate_per_second=100, retry_backoff=0.2, coalesce_window=0)
+    dispatcher.send("u1", "first")
+    time.sleep(0.05)
+    dispatcher.send("u1", "second")
+    assert dispatcher.flush(timeout=5)
+    assert transport.sent == [("u1", "first"), ("u1", "second")]
+
+# ✅ Test: The token bucket paces sends beyond the burst
+def test_token_bucket():
+    bucket = TokenBucket(rate=20, capacity=2)
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+# ✅ Test: Long messages are split under the provider limit
+def test_split_message():
+    chunks = split_message("a" * 8 + "\n" + "b" * 8, limit=10)
+    assert chunks == ["a" * 8, "b" * 8]
+    assert split_message("c" * 25, limit=10) == ["c" * 10, "c" * 10, "c" * 5]
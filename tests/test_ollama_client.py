@@ -0,0 +1,95 @@
+import os,sys
+import json
+import threading
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.llm_cache import LLMResponseCache
+from services.ollama_client import OllamaClient
+
+# ✅ Fixture: a local stand-in for the Ollama /api/generate endpoint
+@pytest.fixture
+def fake_ollama():
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            calls.append(body)
+            if body.get("stream"):
+                words = f"echo: {body['prompt']}".split(" ")
+                chunks = [{"response": w if i == 0 else f" {w}", "done": False} for i, w in enumerate(words)]
+                payload = "".join(json.dumps(c) + "\n" for c in chunks + [{"response": "", "done": True}]).encode()
+            else:
+                payload = json.dumps({"response": f"echo: {body['prompt']}"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", calls
+    server.shutdown()
+
+# ✅ Test: Repeated prompts are served from the cache
+def test_generate_response_uses_cache(fake_ollama, tmp_path):
+    base_url, calls = fake_ollama
+    client = OllamaClient(base_url=base_url, cache=LLMResponseCache(db_path=str(tmp_path / "cache.db")))
+
+    assert client.generate_response("hello") == "echo: hello"
+    assert client.generate_response("hello") == "echo: hello"
+
+    assert len(calls) == 1
+    assert client.get_metrics()["requests"] == 1
+    assert client.get_metrics()["in_flight"] == 0
+
+# ✅ Test: Async variant returns results in prompt order
+def test_agenerate_many(fake_ollama, tmp_path):
+    base_url, calls = fake_ollama
+    client = OllamaClient(base_url=base_url, cache=LLMResponseCache(db_path=str(tmp_path / "cache.db")),
+                          max_concurrency=2)
+
+    replies = asyncio.run(client.agenerate_many(["a", "b", "c"]))
+
+    assert replies == ["echo: a", "echo: b", "echo: c"]
+    assert len(calls) == 3
+
+# ✅ Test: Connection failures fall back to the apology text
+def test_generate_response_unreachable(tmp_path):
+    client = OllamaClient(base_url="http://127.0.0.1:1", max_retries=0,
+                          cache=LLMResponseCache(db_path=str(tmp_path / "cache.db")))
+
+    assert client.generate_response("hello") == "Sorry, I couldn't generate a response at this time."
+    assert client.get_metrics()["errors"] == 1
+
+    # Callers that store results ask for the failure instead of the apology text
+    with pytest.raises(Exception):
+        client.generate_response("hello", raise_on_error=True)
+    with pytest.raises(Exception):
+        list(client.stream_response("hello", raise_on_error=True))
+    assert client.cache.stats()["entries"] == 0
+
+# ✅ Test: Only connection failures and 502/503/504 are retried, never a slow generation
+def test_retries_skip_read_timeouts(tmp_path):
+    client = OllamaClient(base_url="http://127.0.0.1:1", max_retries=2,
+                          cache=LLMResponseCache(db_path=str(tmp_path / "cache.db")))
+    retry = client.session.get_adapter("http://127.0.0.1:1").max_retries
+    assert retry.connect == 2 and retry.read == 0 and retry.other == 0
+    assert set(retry.status_forcelist) == {502, 503, 504}
+
+# ✅ Test: Streaming yields tokens and caches the full reply
+def test_stream_response(fake_ollama, tmp_path):
+    base_url, calls = fake_ollama
+    client = OllamaClient(base_url=base_url, cache=LLMResponseCache(db_path=str(tmp_path / "cache.db")))
+
+    tokens = list(client.stream_response("hello there"))
+
+    assert tokens == ["echo:", " hello", " there"]
+    assert list(client.stream_response("hello there")) == ["echo: hello there"]
+    assert len(calls) == 1
+    assert client.get_metrics()["first_token_p50"] > 0
@@ -0,0 +1,83 @@
+import os,sys
+import re
+from collections import Counter
+import numpy as np
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ort = pytest.importorskip("onnxruntime")
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnx")
+pytest.importorskip("sentence_transformers")
+
+from sentence_transformers import SentenceTransformer
+from engine.catalog_loader import load_catalog_frame, frame_to_courses
+from services.encoder import DEFAULT_MODEL_NAME
+from services.onnx_encoder import OnnxEncoder, export_onnx, MODEL_FILE, QUANTIZED_MODEL_FILE
+from services.vector_store import VectorStore
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+QUERIES = ["learn python for data science", "machine learning for beginners", "web development",
+           "business strategy and marketing", "music theory", "financial markets", "graphic design basics",
+           "deep learning with neural networks", "public speaking", "cloud computing on aws"]
+TOP_K = 10
+
+@pytest.fixture(scope="module")
+def documents():
+    frame = load_catalog_frame(os.path.join(ROOT, "data", "coursea_data.csv"))
+    return [VectorStore.course_document(course) for course in frame_to_courses(frame)[:300]]
+
+def build_tiny_model(path, documents):
+    """A small random BERT with a vocabulary from the catalog, standing in for MiniLM offline"""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    words = Counter(w for text in documents + QUERIES for w in re.findall(r"[a-z]+", text.lower()))
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + [w for w, _ in words.most_common(800)]
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "vocab.txt"), "w") as f:
+        f.write("\n".join(vocab))
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=64, num_hidden_layers=2, num_attention_heads=4,
+                        intermediate_size=128, max_position_embeddings=256)
+    BertModel(config).save_pretrained(path)
+    BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    return path
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory, documents):
+    """(reference model, ONNX export dir): the real MiniLM export when ENCODER_ONNX_DIR is set"""
+    if os.getenv("ENCODER_ONNX_DIR"):
+        return SentenceTransformer(DEFAULT_MODEL_NAME, device="cpu"), os.getenv("ENCODER_ONNX_DIR")
+    source = build_tiny_model(str(tmp_path_factory.mktemp("tiny")), documents)
+    output = export_onnx(source, str(tmp_path_factory.mktemp("onnx")), quantize=True)
+    return SentenceTransformer(source, device="cpu"), output
+
+def top_k(encoder, documents):
+    docs = encoder.encode(documents, batch_size=64)
+    queries = encoder.encode(QUERIES)
+    docs = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return [set(np.argsort(-row)[:TOP_K]) for row in queries @ docs.T]
+
+def mean_overlap(reference, candidate):
+    return np.mean([len(a & b) / TOP_K for a, b in zip(reference, candidate)])
+
+# ✅ Test: The float32 ONNX export reproduces the PyTorch embeddings and rankings
+def test_float32_parity(exported, documents):
+    reference, model_dir = exported
+    onnx_encoder = OnnxEncoder(model_dir, MODEL_FILE)
+
+    expected = reference.encode(QUERIES)
+    actual = onnx_encoder.encode(QUERIES)
+    assert actual.shape == expected.shape
+    assert np.allclose(actual, expected, atol=1e-4)
+    assert onnx_encoder.encode(QUERIES[0]).shape == (onnx_encoder.get_sentence_embedding_dimension(),)
+
+    assert mean_overlap(top_k(reference, documents), top_k(onnx_encoder, documents)) >= 0.99
+
+# ✅ Test: The int8 export keeps most of the top-k
+def test_int8_topk_overlap(exported, documents):
+    reference, model_dir = exported
+    if not os.path.exists(os.path.join(model_dir, QUANTIZED_MODEL_FILE)):
+        pytest.skip("no quantized export")
+    quantized = OnnxEncoder(model_dir, QUANTIZED_MODEL_FILE)
+    assert mean_overlap(top_k(reference, documents), top_k(quantized, documents)) >= 0.8
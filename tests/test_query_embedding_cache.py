@@ -0,0 +1,49 @@
+import os,sys
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.query_embedding_cache import QueryEmbeddingCache
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+# ✅ Test: Repeated and whitespace-variant queries skip the encoder
+def test_memory_hits():
+    encoder = CountingEncoder()
+    cache = QueryEmbeddingCache(model="m", max_entries=10)
+
+    first = cache.encode(["learn python", "data  science"], encoder)
+    second = cache.encode(["  learn\n python ", "data science", "sql"], encoder)
+
+    assert encoder.calls == [["learn python", "data  science"], ["sql"]]
+    assert np.array_equal(first[0], second[0])
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 3
+
+# ✅ Test: The in-memory layer is bounded
+def test_lru_bound():
+    encoder = CountingEncoder()
+    cache = QueryEmbeddingCache(model="m", max_entries=2)
+    cache.encode(["a", "b", "c"], encoder)
+    assert cache.stats()['entries'] == 2
+    cache.encode(["a"], encoder)
+    assert encoder.calls[-1] == ["a"]
+
+# ✅ Test: Embeddings persist on disk across cache instances
+def test_disk_layer(tmp_path):
+    path = str(tmp_path / "queries.db")
+    QueryEmbeddingCache(model="m", db_path=path).encode(["learn python"], CountingEncoder())
+
+    encoder = CountingEncoder()
+    cache = QueryEmbeddingCache(model="m", db_path=path)
+    vectors = cache.encode(["learn python"], encoder)
+    assert encoder.calls == []
+    assert vectors.tolist() == [[12.0, 1.0]]
+    assert cache.stats()['disk_hits'] == 1
+
+    # Another model never reuses these vectors
+    QueryEmbeddingCache(model="other", db_path=path).encode(["learn python"], encoder)
+    assert encoder.calls == [["learn python"]]
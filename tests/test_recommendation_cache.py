@@ -0,0 +1,34 @@
+import os,sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from engine.recommendation_cache import RecommendationCache
+
+RESULT = {'user_id': "u1", 'recommendations': [{'course_id': "1"}], 'total_found': 1}
+
+# ✅ Test: Queries are normalized and profile versions split entries
+def test_key_normalization_and_versions():
+    cache = RecommendationCache()
+    cache.set(RecommendationCache.make_key("u1", "  Learn   Python ", 1, 3), RESULT)
+
+    assert cache.get(RecommendationCache.make_key("u1", "learn python", 1, 3)) == RESULT
+    assert cache.get(RecommendationCache.make_key("u1", "learn python", 2, 3)) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    # Storing a newer version drops the user's older entries
+    cache.set(RecommendationCache.make_key("u1", "learn python", 2, 3), RESULT)
+    assert cache.stats()['entries'] == 1
+
+# ✅ Test: Invalidation, expiry and LRU eviction
+def test_invalidate_expire_evict():
+    cache = RecommendationCache(max_entries=2, ttl_seconds=60)
+    for user_id in ("u1", "u2", "u3"):
+        cache.set(RecommendationCache.make_key(user_id, "", 0), RESULT)
+    assert cache.get(RecommendationCache.make_key("u1", "", 0)) is None
+    assert cache.stats()['entries'] == 2
+
+    cache.invalidate("u2")
+    assert cache.get(RecommendationCache.make_key("u2", "", 0)) is None
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get(RecommendationCache.make_key("u3", "", 0)) is None
@@ -0,0 +1,84 @@
+import os,sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from engine.recommendation_engine import CourseRecommendationEngine, FALLBACK_EXPLANATION
+
+# ✅ Test: Batched explanations are matched by course ID
+def test_parse_batch_explanations_by_id():
+    response = 'Here you go:\n[{"id": "7", "explanation": "Great next step."}, {"id": "3", "explanation": "Fits your goals."}]'
+
+    parsed = CourseRecommendationEngine.parse_batch_explanations(response, ["3", "7"])
+
+    assert parsed == {"3": "Fits your goals.", "7": "Great next step."}
+
+# ✅ Test: Truncated replies keep the complete entries only
+def test_parse_batch_explanations_truncated():
+    response = '[{"id": "3", "explanation": "Fits your goals."}, {"id": "7", "explanation": "Great ne'
+
+    parsed = CourseRecommendationEngine.parse_batch_explanations(response, ["3", "7"])
+
+    assert parsed == {"3": "Fits your goals."}
+
+# ✅ Test: Unparseable replies produce no explanations
+def test_parse_batch_explanations_garbage():
+    assert CourseRecommendationEngine.parse_batch_explanations("I can't do that.", ["3"]) == {}
+
+# ✅ Test: Explanation streams run concurrently and are drained per course
+def test_stream_explanations_concurrently():
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+
+    started = threading.Barrier(3, timeout=2)
+
+    def stream(course, preferences):
+        started.wait()  # only passes once all three streams are running at once
+        for word in course['title'].split():
+            time.sleep(0.01)
+            yield word + " "
+
+    engine = SimpleNamespace(explanation_pool=ThreadPoolExecutor(max_workers=3), explanation_deadline=5.0,
+                             stream_recommendation_explanation=stream)
+    courses = [{'title': 'Intro to Python'}, {'title': 'Data Science'}, {'title': 'Web Dev Basics'}]
+    texts = [""] * len(courses)
+    for index, token in CourseRecommendationEngine.stream_explanations(engine, courses, {}):
+        texts[index] += token
+    assert [text.strip() for text in texts] == [course['title'] for course in courses]
+
+    def slow(course, preferences):
+        yield "partial"
+        time.sleep(1)
+        yield " never"
+
+    engine.stream_recommendation_explanation = slow
+    tokens = list(CourseRecommendationEngine.stream_explanations(engine, courses[:1], {}, deadline=0.2))
+    assert tokens == [(0, "partial")]
+
+# ✅ Test: A batch reply missing courses is not cached, so the next request asks the model again
+def test_batch_explanations_cache_only_complete_replies(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+    from services.llm_cache import LLMResponseCache
+
+    replies = ['Sorry, no JSON today.',
+               '[{"id": "3", "explanation": "Fits your goals."}, {"id": "7", "explanation": "Good pace."}]']
+    calls = []
+
+    def generate_response(prompt, use_cache=True, raise_on_error=False):
+        assert not use_cache
+        calls.append(prompt)
+        return replies[len(calls) - 1]
+
+    llm = SimpleNamespace(model="test", cache=LLMResponseCache(db_path=str(tmp_path / "llm.db")),
+                          generate_response=generate_response)
+    engine = SimpleNamespace(llm=llm, explanation_pool=ThreadPoolExecutor(max_workers=1), explanation_deadline=5.0,
+                             parse_batch_explanations=CourseRecommendationEngine.parse_batch_explanations)
+    courses = [{'course_id': cid, 'title': f'Course {cid}', 'category': 'Data', 'difficulty': 'Beginner',
+                'rating': 4.5, 'duration': 10} for cid in ("3", "7")]
+
+    first = CourseRecommendationEngine.generate_batch_explanations(engine, courses, {})
+    assert first == [FALLBACK_EXPLANATION] * 2
+    second = CourseRecommendationEngine.generate_batch_explanations(engine, courses, {})
+    assert second == ["Fits your goals.", "Good pace."]
+    third = CourseRecommendationEngine.generate_batch_explanations(engine, courses, {})
+    assert third == second and len(calls) == 2
@@ -0,0 +1,57 @@
+import os,sys
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from models.course import Course
+from models.course_catalog import CourseCatalog
+from engine.reranker import Reranker, DEFAULT_WEIGHTS
+
+@pytest.fixture
+def catalog():
+    return CourseCatalog.from_courses([
+        Course(id="1", title="Intro to Python", description="", category="Programming",
+               difficulty="beginner", duration=20, tags=[], rating=4.0, price=0.0),
+        Course(id="2", title="Advanced ML", description="", category="Data Science",
+               difficulty="advanced", duration=45, tags=[], rating=4.9, price=199.0),
+        Course(id="3", title="Python for Data", description="", category="Data Science",
+               difficulty="beginner", duration=90, tags=[], rating=3.5, price=40.0),
+    ])
+
+def candidates():
+    return [{'course_id': "1", 'similarity_score': 0.5},
+            {'course_id': "2", 'similarity_score': 0.45},
+            {'course_id': "3", 'similarity_score': 0.4}]
+
+PREFERENCES = {'preferred_categories': ["Data Science"], 'preferred_difficulty': "beginner",
+               'preferred_duration': "long", 'budget_preference': "low"}
+
+# ✅ Test: Default weights reproduce the original category/difficulty/duration bonuses
+def test_default_weights_match_original_bonuses(catalog):
+    ranked = Reranker(catalog, DEFAULT_WEIGHTS).rerank(candidates(), PREFERENCES)
+    assert [c['course_id'] for c in ranked] == ["3", "2", "1"]
+    assert [c['final_score'] for c in ranked] == pytest.approx([0.4 + 0.2 + 0.1 + 0.1, 0.45 + 0.2, 0.5 + 0.1])
+
+# ✅ Test: Rating and budget weights change the ordering
+def test_extra_signals(catalog):
+    weights = {**DEFAULT_WEIGHTS, 'category': 0.0, 'difficulty': 0.0, 'duration': 0.0, 'rating': 1.0}
+    assert Reranker(catalog, weights).rerank(candidates(), PREFERENCES)[0]['course_id'] == "2"
+    weights = {**DEFAULT_WEIGHTS, 'category': 0.0, 'difficulty': 0.0, 'duration': 0.0, 'budget': 1.0}
+    assert [c['course_id'] for c in Reranker(catalog, weights).rerank(candidates(), PREFERENCES)] == ["1", "3", "2"]
+
+# ✅ Test: Top-k keeps the best k and leaves the input untouched
+def test_top_k(catalog):
+    courses = candidates()
+    ranked = Reranker(catalog, DEFAULT_WEIGHTS).rerank(courses, PREFERENCES, k=2)
+    assert [c['course_id'] for c in ranked] == ["3", "2"]
+    assert all('final_score' not in c for c in courses)
+    assert Reranker(catalog, DEFAULT_WEIGHTS).rerank([], PREFERENCES, k=2) == []
+
+# ✅ Test: The engine ranks only the top k but reports how many candidates passed the filter
+def test_engine_filter_recommendations_top_k(catalog):
+    from types import SimpleNamespace
+    from engine.recommendation_engine import CourseRecommendationEngine
+    engine = SimpleNamespace(catalog=catalog, rerank_weights=DEFAULT_WEIGHTS)
+    stale = {'course_id': "99", 'similarity_score': 0.9}
+    selected, total = CourseRecommendationEngine.filter_recommendations(
+        engine, candidates() + [stale], PREFERENCES, {"1"}, k=1)
+    assert [c['course_id'] for c in selected] == ["3"]
+    assert total == 2
@@ -0,0 +1,35 @@
+import os,sys
+import subprocess
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ("torch", "sentence_transformers", "chromadb", "pandas")
+
+# ✅ Test: Importing the engine doesn't load the ML stack
+def test_engine_import_is_lightweight():
+    code = (
+        "import sys; import engine.recommendation_engine, services.vector_store; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+# ✅ Test: The webhook imports within the start-up budget and leaves the ML stack to warm-up
+def test_webhook_import_within_budget(tmp_path):
+    pytest.importorskip("flask")
+    pytest.importorskip("twilio")
+    from utils.config import get_setting
+    budget = get_setting("STARTUP_BUDGET_SECONDS", 2.0, cast=float)
+    code = (
+        "import sys, time; started = time.perf_counter(); import interfaces.whatsapp_interface; "
+        "print(time.perf_counter() - started, ','.join(m for m in "
+        f"{HEAVY_MODULES!r} if m in sys.modules), sep='|')"
+    )
+    # Run from a scratch directory so the module's databases aren't created in the repo
+    env = {**os.environ, "PYTHONPATH": ROOT, "WARMUP_MODE": "off"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    seconds, heavy = result.stdout.strip().splitlines()[-1].split("|")
+    assert float(seconds) < budget
+    assert heavy == ""
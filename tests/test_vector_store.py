@@ -1,28 +1,24 @@
 import os,sys
 import shutil
 import pytest
+import numpy as np
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from services.vector_store import VectorStore
 from models.course import Course
+from models.search_constraints import SearchConstraints
 
 # ✅ Sanity check to make sure pytest collects this file
 def test_sanity():
     assert 1 + 1 == 2
 
 # ✅ Fixture to create a temporary ChromaDB instance
-@pytest.fixture(scope="function")
-def temp_vector_store():
-    temp_path = "./test_chroma_db"
-    
-    # Clean old test DB
-    if os.path.exists(temp_path):
-        shutil.rmtree(temp_path)
+@pytest.fixture(scope="function", params=["chroma", "numpy"])
+def temp_vector_store(request, tmp_path):
+    # A fresh directory per test: Chroma caches clients by path, so reusing a
+    # deleted path within one process leaves a read-only database behind.
+    temp_path = str(tmp_path / "test_chroma_db")
 
-    store = VectorStore(collection_name="test_courses")
-    
-    # Override with isolated temp path
-    store.client = store.client.__class__(path=temp_path)
-    store.collection = store.client.get_or_create_collection(name="test_courses")
+    store = VectorStore(collection_name="test_courses", persist_path=temp_path, backend=request.param)
     
     yield store
 
@@ -88,3 +84,238 @@ def test_search_similar_courses(temp_vector_store, sample_courses):
         assert "title" in course
         assert "similarity_score" in course
         assert 0 <= course["similarity_score"] <= 1, "Similarity score should be in [0, 1]"
+
+# ✅ Test: Incremental sync only touches changed rows
+def test_sync_courses_is_incremental(temp_vector_store, sample_courses):
+    report = temp_vector_store.sync_courses(sample_courses)
+    assert report == {"added": 2, "updated": 0, "skipped": 0, "removed": 0}
+
+    report = temp_vector_store.sync_courses(sample_courses)
+    assert report == {"added": 0, "updated": 0, "skipped": 2, "removed": 0}
+
+    sample_courses[0].title = "Intro to Python 3"
+    report = temp_vector_store.sync_courses(sample_courses[:1])
+    assert report == {"added": 0, "updated": 1, "skipped": 0, "removed": 1}
+    assert temp_vector_store.collection.count() == 1
+
+# ✅ Test: Batched search matches single-query search
+def test_search_similar_courses_batch(temp_vector_store, sample_courses):
+    temp_vector_store.add_courses(sample_courses)
+
+    queries = ["I want to learn Python", "machine learning for experts"]
+    preferences = [{"preferred_difficulty": "Beginner"}, {"preferred_difficulty": "Advanced"}]
+
+    batch = temp_vector_store.search_similar_courses_batch(queries, preferences, n_results=1)
+
+    assert len(batch) == 2
+    for query, prefs, results in zip(queries, preferences, batch):
+        single = temp_vector_store.search_similar_courses(query, prefs, n_results=1)
+        assert [c["course_id"] for c in results] == [c["course_id"] for c in single]
+    assert batch[0][0]["course_id"] == "1"
+    assert batch[1][0]["course_id"] == "2"
+
+# ✅ Test: NumPy backend persists vectors and reopens them memory-mapped
+def test_numpy_backend_reloads_from_disk(tmp_path, sample_courses):
+    store = VectorStore(collection_name="test_courses", persist_path=str(tmp_path), backend="numpy")
+    store.add_courses(sample_courses)
+
+    reopened = VectorStore(collection_name="test_courses", persist_path=str(tmp_path), backend="numpy")
+    assert reopened.collection.count() == 2
+    assert isinstance(reopened.collection.vectors, np.memmap)
+
+    results = reopened.search_similar_courses("I want to learn Python", {}, n_results=1)
+    assert results[0]["course_id"] == "1"
+    assert results[0]["tags"] == ["python", "beginner", "coding"]
+
+# ✅ Test: float16 storage refuses a float32 index until it is converted explicitly
+def test_numpy_backend_float16_vectors(tmp_path, sample_courses):
+    from services.numpy_index import NumpyVectorIndex
+    store = VectorStore(collection_name="test_courses", persist_path=str(tmp_path), backend="numpy")
+    store.add_courses(sample_courses)
+    expected = store.search_similar_courses("I want to learn Python", {}, n_results=2)
+
+    with pytest.raises(ValueError, match="float32"):
+        VectorStore(collection_name="test_courses", persist_path=str(tmp_path), backend="numpy",
+                    vector_dtype="float16")
+    assert NumpyVectorIndex.stored_dtype(str(tmp_path), "test_courses") == "float32"
+
+    NumpyVectorIndex.convert(str(tmp_path), "test_courses", "float16")
+    reduced = VectorStore(collection_name="test_courses", persist_path=str(tmp_path), backend="numpy",
+                          vector_dtype="float16")
+    assert reduced.collection.vectors.dtype == np.float16
+    assert np.load(reduced.collection.vectors_path, mmap_mode='r').dtype == np.float16
+
+    results = reduced.search_similar_courses("I want to learn Python", {}, n_results=2)
+    assert [c["course_id"] for c in results] == [c["course_id"] for c in expected]
+    assert results[0]["similarity_score"] == pytest.approx(expected[0]["similarity_score"], abs=1e-2)
+
+    with pytest.raises(ValueError):
+        VectorStore(collection_name="test_courses", persist_path=str(tmp_path), backend="numpy", vector_dtype="int4")
+
+# ✅ Test: HNSW parameters reach the Chroma collection; search_ef can change later
+def test_chroma_hnsw_parameters(tmp_path, sample_courses):
+    from services.vector_store import built_hnsw
+    path = str(tmp_path / "hnsw")
+    store = VectorStore(collection_name="test_courses", persist_path=path, backend="chroma",
+                        hnsw={'M': 32, 'construction_ef': 200, 'search_ef': 64})
+    assert built_hnsw(store.collection) == {'M': 32, 'construction_ef': 200, 'search_ef': 64}
+    store.add_courses(sample_courses)
+
+    reopened = VectorStore(collection_name="test_courses", persist_path=path, backend="chroma",
+                           hnsw={'M': 8, 'construction_ef': 50, 'search_ef': 128})
+    built = built_hnsw(reopened.collection)
+    assert (built['M'], built['construction_ef']) == (32, 200)
+    if hasattr(reopened.collection, "configuration"):
+        assert built['search_ef'] == 128
+    assert reopened.search_similar_courses("I want to learn Python", {}, n_results=1)[0]["course_id"] == "1"
+
+# ✅ Test: An interrupted sync resumes from its last checkpoint
+def test_sync_courses_resumes_after_interruption(temp_vector_store, sample_courses):
+    temp_vector_store.pipeline.batch_size = 1
+    upsert = temp_vector_store.collection.upsert
+    calls = []
+
+    def failing_upsert(**kwargs):
+        calls.append(kwargs["ids"])
+        if len(calls) == 2:
+            raise RuntimeError("interrupted")
+        return upsert(**kwargs)
+
+    temp_vector_store.collection.upsert = failing_upsert
+    with pytest.raises(RuntimeError):
+        temp_vector_store.sync_courses(sample_courses)
+    temp_vector_store.collection.upsert = upsert
+
+    report = temp_vector_store.sync_courses(sample_courses)
+    assert report == {"added": 1, "updated": 0, "skipped": 1, "removed": 0}
+    assert temp_vector_store.pipeline.stats["documents"] == 1
+
+# ✅ Test: Rows the manifest doesn't know about are reconciled
+def test_sync_courses_reconciles_untracked_rows(temp_vector_store, sample_courses):
+    temp_vector_store.add_courses(sample_courses)
+
+    report = temp_vector_store.sync_courses(sample_courses[:1])
+
+    assert report == {"added": 1, "updated": 0, "skipped": 0, "removed": 1}
+    assert temp_vector_store.collection.count() == 1
+
+# ✅ Test: Constraints are applied inside the vector search
+def test_search_with_constraints(temp_vector_store, sample_courses):
+    temp_vector_store.sync_courses(sample_courses)
+    query = "I want to learn Python"
+
+    excluded = temp_vector_store.search_similar_courses(query, {}, n_results=2,
+                                                        constraints=SearchConstraints(exclude_ids={"1"}))
+    assert [c["course_id"] for c in excluded] == ["2"]
+
+    free_only = temp_vector_store.search_similar_courses(query, {}, n_results=2,
+                                                         constraints=SearchConstraints(max_price=10))
+    assert [c["course_id"] for c in free_only] == ["1"]
+
+    combined = SearchConstraints(difficulties={"Advanced"}, categories={"Data Science"}, min_rating=4.6)
+    assert [c["course_id"] for c in temp_vector_store.search_similar_courses(query, {}, 2, combined)] == ["2"]
+
+    assert temp_vector_store.search_similar_courses(query, {}, 2, SearchConstraints(categories=set())) == []
+
+# ✅ Test: A restrictive filter doesn't widen the search once every match has been seen
+def test_search_with_constraints_stops_widening(temp_vector_store, sample_courses):
+    courses = sample_courses + [
+        Course(id=str(i), title=f"Cooking {i}", description="Kitchen basics.", category="Lifestyle",
+               difficulty="Beginner", tags=["food"], duration=2, rating=4.0, price=5.0)
+        for i in range(3, 20)
+    ]
+    temp_vector_store.sync_courses(courses)
+    query = temp_vector_store.collection.query
+    calls = []
+
+    def counting_query(**kwargs):
+        calls.append(kwargs["n_results"])
+        return query(**kwargs)
+
+    temp_vector_store.collection.query = counting_query
+    results = temp_vector_store.search_similar_courses("I want to learn Python", {}, n_results=5,
+                                                       constraints=SearchConstraints(categories={"Programming"}))
+    assert [c["course_id"] for c in results] == ["1"]
+    assert calls == [5]
+
+# ✅ Test: Bulk writes go to an append-only sidecar and the index is rewritten once
+def test_numpy_index_bulk_writes(tmp_path):
+    from services.numpy_index import NumpyVectorIndex
+    index = NumpyVectorIndex(str(tmp_path), "bulk")
+    index.upsert(ids=["a"], embeddings=[[1.0, 0.0]])
+    written = os.path.getmtime(index.vectors_path)
+
+    index.begin_bulk()
+    index.upsert(ids=["b"], embeddings=[[0.0, 1.0]], metadatas=[{"title": "B"}])
+    index.upsert(ids=["a", "c"], embeddings=[[0.0, 1.0], [1.0, 1.0]])
+    index.update(ids=["a"], metadatas=[{"title": "A"}])
+    assert os.path.getmtime(index.vectors_path) == written
+    assert os.path.exists(index.pending_log_path)
+
+    index.end_bulk()
+    assert not os.path.exists(index.pending_log_path)
+    reopened = NumpyVectorIndex(str(tmp_path), "bulk")
+    assert reopened.ids == ["a", "b", "c"]
+    assert reopened.get(ids=["a"])["metadatas"][0]["title"] == "A"
+    assert reopened.query([[0.0, 1.0]], n_results=1)["ids"][0][0] in {"a", "b"}
+
+# ✅ Test: Queries during a bulk load see staged rows without writing the index
+def test_numpy_index_query_during_bulk(tmp_path):
+    import threading
+    from services.numpy_index import NumpyVectorIndex
+    index = NumpyVectorIndex(str(tmp_path), "bulk")
+    index.upsert(ids=["a"], embeddings=[[1.0, 0.0]])
+    written = os.path.getmtime(index.vectors_path)
+
+    index.begin_bulk()
+    errors = []
+
+    def search():
+        try:
+            for _ in range(50):
+                index.query([[0.0, 1.0]], n_results=2)
+        except Exception as e:
+            errors.append(e)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    for i in range(50):
+        index.upsert(ids=[f"b{i}"], embeddings=[[0.0, 1.0]])
+    searcher.join()
+    assert not errors
+    assert index.query([[0.0, 1.0]], n_results=1)["ids"][0][0].startswith("b")
+    assert os.path.getmtime(index.vectors_path) == written
+    assert os.path.exists(index.pending_log_path)
+
+    index.end_bulk()
+    assert not os.path.exists(index.pending_log_path)
+    assert NumpyVectorIndex(str(tmp_path), "bulk").count() == 51
+
+# ✅ Test: Writes from an interrupted bulk load are recovered on the next open
+def test_numpy_index_recovers_interrupted_bulk(tmp_path):
+    from services.numpy_index import NumpyVectorIndex
+    index = NumpyVectorIndex(str(tmp_path), "bulk")
+    index.begin_bulk()
+    index.upsert(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]], documents=["A", "B"])
+    with open(index.pending_log_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "torn", "ro')  # process died mid-write
+
+    recovered = NumpyVectorIndex(str(tmp_path), "bulk")
+    assert recovered.ids == ["a", "b"]
+    assert recovered.get(ids=["b"])["documents"] == ["B"]
+    assert recovered.query([[0.0, 1.0]], n_results=1)["ids"] == [["b"]]
+    assert not os.path.exists(recovered.pending_log_path)
+
+# ✅ Test: Manifest checkpoints are journaled and folded in by save
+def test_manifest_checkpoint_journal(tmp_path):
+    from services.catalog_manifest import CatalogManifest
+    path = str(tmp_path / "manifest.json")
+    manifest = CatalogManifest(path)
+    manifest.checkpoint({"1": {"text": "t1", "meta": "m1"}})
+    manifest.checkpoint({"2": {"text": "t2", "meta": "m2"}})
+    assert not os.path.exists(path)
+    assert set(CatalogManifest(path).entries) == {"1", "2"}
+
+    manifest.save()
+    assert not os.path.exists(manifest.journal_path)
+    assert set(CatalogManifest(path).entries) == {"1", "2"}
@@ -0,0 +1,28 @@
+import os,sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.video_cache import VideoCache, MISS
+
+# ✅ Test: Found and not-found lookups are both cached
+def test_positive_and_negative_entries(tmp_path):
+    cache = VideoCache(db_path=str(tmp_path / "videos.db"))
+    assert cache.get("1", "Python introduction") is MISS
+
+    cache.set("1", "Python introduction", "abc123")
+    cache.set("2", "Obscure introduction", None)
+    assert cache.get("1", "Python introduction") == "abc123"
+    assert cache.get("2", "Obscure introduction") is None
+
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['negative_entries'] == 1 and stats['hits'] == 2
+
+# ✅ Test: Entries expire by TTL and when the course's query changes
+def test_expiry_and_query_change(tmp_path):
+    cache = VideoCache(db_path=str(tmp_path / "videos.db"), ttl_seconds=3600, negative_ttl_seconds=-1)
+    cache.set("1", "Python introduction", "abc123")
+    cache.set("2", "Obscure introduction", None)
+
+    assert cache.get("1", "Advanced Python introduction") is MISS
+    assert cache.get("2", "Obscure introduction") is MISS
+
+    cache.ttl_seconds = -1
+    assert cache.get("1", "Python introduction") is MISS
@@ -0,0 +1,17 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def get_setting(name: str, default=None, cast=str):
+    """Read a setting from the environment (or .env), falling back to a default"""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
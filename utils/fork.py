@@ -0,0 +1,19 @@
+import os
+import weakref
+
+
+def register_after_fork(method):
+    """Call a bound method in every child process forked after this point.
+
+    Used to rebuild threads, locks, connections and sockets that a pre-fork
+    server's workers would otherwise inherit from the parent. Only a weak
+    reference is kept, so registering doesn't keep the object alive.
+    """
+    ref = weakref.WeakMethod(method)
+
+    def run():
+        bound = ref()
+        if bound is not None:
+            bound()
+
+    os.register_at_fork(after_in_child=run)
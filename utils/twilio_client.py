@@ -1,18 +1,33 @@
 from twilio.rest import Client
+from services.message_dispatcher import MessageDispatcher
+from utils.config import get_setting
 
 account_sid = 'AC847b514e17b0bcd06432f0701f49c6fd'
 auth_token = '8ebb3a7a1bcc8e8fb2d7ea36f6a2b8d9'
 
 client = Client(account_sid, auth_token)
 
+def deliver_whatsapp_message(to_number: str, message: str):
+    """Send one message through the Twilio API, raising on failure"""
+    msg = client.messages.create(
+        from_='whatsapp:+14155238886',
+        body=message,
+        to=f'whatsapp:{to_number}'
+    )
+    return msg.sid
+
+# The rate and burst are account-wide limits; every process sending through the
+# account (gunicorn workers, the Streamlit app) paces itself to an equal share
+SENDING_PROCESSES = max(1, get_setting("WHATSAPP_SENDING_PROCESSES", 1, cast=int))
+
+dispatcher = MessageDispatcher(
+    deliver_whatsapp_message,
+    rate_per_second=get_setting("WHATSAPP_SEND_RATE", 1.0, cast=float) / SENDING_PROCESSES,
+    burst=max(1.0, get_setting("WHATSAPP_SEND_BURST", 5.0, cast=float) / SENDING_PROCESSES),
+    max_retries=get_setting("WHATSAPP_SEND_RETRIES", 3, cast=int),
+    coalesce_window=get_setting("WHATSAPP_COALESCE_SECONDS", 0.5, cast=float)
+)
+
 def send_whatsapp_message(to_number: str, message: str):
-    try:
-        msg = client.messages.create(
-            from_='whatsapp:+14155238886',
-            body=message,
-            to=f'whatsapp:{to_number}'
-        )
-        return msg.sid
-    except Exception as e:
-        print(f"❌ Failed to send WhatsApp message: {e}")
-        return None
+    """Queue a message for delivery; returns a future for callers that want the outcome"""
+    return dispatcher.send(to_number, message)
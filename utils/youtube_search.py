@@ -1,25 +1,109 @@
 # youtube_search.py
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
+from services.video_cache import VideoCache, MISS
+from utils.config import get_setting
+from utils.logger import logger
+
+
+def default_video_cache():
+    """Build the video cache configured through the environment, if enabled"""
+    if not get_setting("VIDEO_CACHE_ENABLED", True, cast=bool):
+        return None
+    return VideoCache(
+        db_path=get_setting("VIDEO_CACHE_PATH", "video_cache.db"),
+        ttl_seconds=get_setting("VIDEO_CACHE_TTL_SECONDS", 7 * 24 * 3600, cast=int),
+        negative_ttl_seconds=get_setting("VIDEO_CACHE_NEGATIVE_TTL_SECONDS", 24 * 3600, cast=int)
+    )
+
 
 class YouTubeSearch:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache: VideoCache = None, max_workers: int = None):
         self.api_key = api_key
         self.youtube = build('youtube', 'v3', developerKey=self.api_key)
+        self._local = threading.local()
+        self.cache = cache if cache is not None else default_video_cache()
+        self.max_workers = max_workers or get_setting("YOUTUBE_LOOKUP_WORKERS", 4, cast=int)
+
+    def _service(self):
+        # The underlying HTTP client isn't thread-safe, so lookup threads get their own
+        if threading.current_thread() is threading.main_thread():
+            return self.youtube
+        service = getattr(self._local, "youtube", None)
+        if service is None:
+            service = build('youtube', 'v3', developerKey=self.api_key)
+            self._local.youtube = service
+        return service
+
+    def _search(self, query, max_results=1):
+        """Search the API, raising on errors; returns None when nothing was found"""
+        response = self._service().search().list(
+            q=query,
+            part='snippet',
+            maxResults=max_results,
+            type='video'
+        ).execute()
+        if response['items']:
+            return response['items'][0]['id']['videoId']
+        return None
 
     def search_video(self, query, max_results=1):
         try:
-            request = self.youtube.search().list(
-                q=query,
-                part='snippet',
-                maxResults=max_results,
-                type='video'
-            )
-            response = request.execute()
-            if response['items']:
-                video_id = response['items'][0]['id']['videoId']
-                return video_id
-            else:
-                return None
+            return self._search(query, max_results)
         except Exception as e:
             print(f"Error during YouTube search: {e}")
             return None
+
+    @staticmethod
+    def course_query(course: dict) -> str:
+        return f"{course['title']} introduction"
+
+    def video_for_course(self, course: dict):
+        """Video ID for a course, searching the API at most once per cache TTL"""
+        query = self.course_query(course)
+        if self.cache is None:
+            return self.search_video(query)
+        cached = self.cache.get(course['course_id'], query)
+        if cached is not MISS:
+            return cached
+        try:
+            video_id = self._search(query)
+        except Exception as e:
+            # Errors aren't cached, so the next view tries again
+            logger.warning(f"YouTube search for course {course['course_id']} failed: {e}")
+            return None
+        self.cache.set(course['course_id'], query, video_id)
+        return video_id
+
+    def videos_for_courses(self, courses: list[dict]) -> dict:
+        """Map course IDs to video IDs, looking uncached courses up concurrently"""
+        if not courses:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(courses))) as pool:
+            video_ids = list(pool.map(self.video_for_course, courses))
+        return {course['course_id']: video_id for course, video_id in zip(courses, video_ids)}
+
+    def prepopulate(self, courses: list[dict], max_lookups: int = None) -> int:
+        """Fill the cache for a list of courses ahead of time; returns how many needed a search"""
+        if self.cache is None:
+            return 0
+        pending = [c for c in courses if self.cache.get(c['course_id'], self.course_query(c)) is MISS]
+        if max_lookups is not None:
+            # The API quota is per day, so large catalogs are filled over several runs
+            pending = pending[:max_lookups]
+        self.videos_for_courses(pending)
+        logger.info(f"Pre-populated {len(pending)} course videos, cache stats: {self.cache.stats()}")
+        return len(pending)
+
+
+if __name__ == "__main__":
+    # Offline job: python -m utils.youtube_search [csv_path] [max_lookups]
+    from engine.catalog_loader import load_catalog_frame
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "data/coursea_data.csv"
+    max_lookups = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    frame = load_catalog_frame(csv_path)
+    catalog_courses = [{'course_id': course_id, 'title': title} for course_id, title in zip(frame['id'], frame['title'])]
+    YouTubeSearch(get_setting("YOUTUBE_API_KEY")).prepopulate(catalog_courses, max_lookups)